@@ -0,0 +1,169 @@
+"""Микробенчмарк резервного парсера: fallback_extractor против прежних методов VKParser
+
+Запуск из корня репозитория:
+    python benchmarks/bench_fallback_extractor.py [--posts 5000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fallback_extractor
+
+MIN_EVENT_DATE = datetime(2025, 11, 1)
+
+
+# === ПРЕЖНЯЯ РЕАЛИЗАЦИЯ (копия методов VKParser) ===
+def legacy_extract_date(text):
+    date_patterns = [
+        r'(\d{1,2}\.\d{1,2}\.\d{4})',
+        r'(\d{1,2}\.\d{1,2})(?!\.\d)',
+        r'(\d{1,2}\s+(?:январ[ья]|феврал[ья]|март[а]?|апрел[ья]|ма[йя]|июн[ья]|июл[ья]|август[ья]|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья])\s+\d{4})',
+        r'(\d{1,2}\s+(?:январ[ья]|феврал[ья]|март[а]?|апрел[ья]|ма[йя]|июн[ья]|июл[ья]|август[ья]|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья]))',
+    ]
+
+    month_mapping = {
+        'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4,
+        'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'август': 8,
+        'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12
+    }
+
+    for pattern in date_patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        for match in matches:
+            date_str = match if isinstance(match, str) else match[0]
+            try:
+                if re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', date_str):
+                    day, month, year = map(int, date_str.split('.'))
+                    date_obj = datetime(year, month, day)
+                    if date_obj >= MIN_EVENT_DATE:
+                        return date_obj.strftime('%Y-%m-%d')
+                elif re.match(r'\d{1,2}\.\d{1,2}(?!\.\d)', date_str):
+                    day, month = map(int, date_str.split('.'))
+                    current_year = datetime.now().year
+                    if month < datetime.now().month or (month == datetime.now().month and day < datetime.now().day):
+                        current_year += 1
+                    date_obj = datetime(current_year, month, day)
+                    if date_obj >= MIN_EVENT_DATE:
+                        return date_obj.strftime('%Y-%m-%d')
+                elif any(month in date_str.lower() for month in month_mapping.keys()):
+                    for month_name, month_num in month_mapping.items():
+                        if month_name in date_str.lower():
+                            numbers = re.findall(r'\d+', date_str)
+                            if numbers:
+                                day = int(numbers[0])
+                                year_match = re.search(r'\d{4}', date_str)
+                                year = int(year_match.group()) if year_match else datetime.now().year
+                                date_obj = datetime(year, month_num, day)
+                                if date_obj >= MIN_EVENT_DATE:
+                                    return date_obj.strftime('%Y-%m-%d')
+            except Exception:
+                continue
+
+    return MIN_EVENT_DATE.strftime('%Y-%m-%d')
+
+
+def legacy_extract_time(text):
+    time_patterns = [
+        r'(\d{1,2}:\d{2})',
+        r'(\d{1,2}\s*[чh]\s*\d{1,2})',
+    ]
+
+    for pattern in time_patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        for time_str in matches:
+            try:
+                if ':' in time_str:
+                    hours, minutes = time_str.split(':')
+                    return f"{int(hours):02d}:{int(minutes):02d}"
+                elif any(char in time_str.lower() for char in ['ч', 'h']):
+                    time_str = re.sub(r'[чhмm\s]', ' ', time_str).strip()
+                    parts = time_str.split()
+                    if len(parts) == 2:
+                        hours, minutes = parts
+                        return f"{int(hours):02d}:{int(minutes):02d}"
+            except Exception:
+                continue
+
+    return "18:00"
+
+
+def legacy_extract_location(text):
+    location_keywords = [
+        'ауд.', 'аудитория', 'корпус', 'МИСИС', 'лаборатория', 'зал',
+        'комната', 'кабинет', 'актовый', 'конференц', 'лекторий', 'актовый зал'
+    ]
+
+    lines = text.split('\n')
+    for line in lines:
+        line = line.strip()
+        if any(keyword in line.lower() for keyword in location_keywords):
+            return line
+
+    return "МИСИС"
+
+
+def legacy_extract(text):
+    return legacy_extract_date(text), legacy_extract_time(text), legacy_extract_location(text)
+
+
+# === ТЕСТОВЫЕ ПОСТЫ ===
+DATES = ['13.11.2026', '5.12', '1 декабря 2026', '20 мая', '31.02.2026', '7 марта', '01.03.2024', '']
+TIMES = ['в 18:30', 'начало в 9:00', 'с 14ч30', '', 'в 19 h 15']
+PLACES = ['Главный корпус, ауд. 301', 'Актовый зал Горного института', 'Лекторий Б-4', 'онлайн', '']
+FILLER = ('Приглашаем студентов МИСИС на встречу с выпускниками. Будет интересно, '
+          'расскажем о стажировках, карьере и проектах. Регистрация по ссылке vk.cc/abc. ')
+
+
+def make_posts(count, seed=42):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        lines = [f"Анонс мероприятия номер {i}", rng.choice(FILLER.split('. ')) + '.',
+                 f"Когда: {rng.choice(DATES)} {rng.choice(TIMES)}".strip(),
+                 f"Где: {rng.choice(PLACES)}",
+                 FILLER * rng.randint(1, 6)]
+        rng.shuffle(lines)
+        posts.append('\n'.join(lines))
+    return posts
+
+
+def bench(function, posts, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in posts:
+            function(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+    now = datetime.now()
+
+    legacy_time = bench(legacy_extract, posts, args.repeat)
+    new_time = bench(lambda text: fallback_extractor.extract(text, MIN_EVENT_DATE, now), posts, args.repeat)
+
+    differences = sum(1 for text in posts
+                      if legacy_extract(text) != fallback_extractor.extract(text, MIN_EVENT_DATE, now))
+
+    print(f"постов: {len(posts)}, повторов: {args.repeat}")
+    print(f"прежний парсер:     {legacy_time * 1000:8.1f} мс ({len(posts) / legacy_time:,.0f} постов/с)")
+    print(f"fallback_extractor: {new_time * 1000:8.1f} мс ({len(posts) / new_time:,.0f} постов/с)")
+    print(f"ускорение: x{legacy_time / new_time:.1f}, расхождений в результатах: {differences}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""Сквозной бенчмарк бота на локальных заглушках VK, YandexGPT и Telegram
+
+Прогоняет VKParser.search_events, потоковый parse_and_save, save_events_to_db,
+events_handler и week_handler и печатает JSON с пропускной способностью и задержками p50/p95/p99.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_pipeline.py --posts 300 --vk-latency 80 --llm-latency 400 --output result.json
+
+Переводчик подменяется заглушкой в процессе. Лимиты частоты берутся из тех же
+переменных окружения, что и у бота (VK_REQUESTS_PER_SECOND, AI_CONCURRENCY,
+TELEGRAM_MESSAGES_PER_SECOND и т.д.).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import ApiProfile, StubConfig, StubServers
+
+KEYWORDS = 'лекция,семинар,мероприятие,хакатон,конференц'
+
+
+class StubTranslator:
+    """Синхронный переводчик-заглушка с интерфейсом googletrans"""
+    class Result:
+        def __init__(self, text):
+            self.text = text
+
+    def translate(self, text, dest='en', **kwargs):
+        if isinstance(text, list):
+            return [self.Result(f"[{dest}] {item}") for item in text]
+        return self.Result(f"[{dest}] {text}")
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, total_seconds, units, **extra):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'total_s': round(total_seconds, 4),
+        'throughput_per_s': round(units / total_seconds, 2) if total_seconds > 0 else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 2) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None,
+        'max_ms': round(values[-1] * 1000, 2) if values else None,
+        **extra
+    }
+
+
+async def timed_concurrently(calls, concurrency):
+    """Выполнить корутины-фабрики с ограничением параллельности; (задержки, общее время)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(call):
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(call) for call in calls))
+    return latencies, time.perf_counter() - started
+
+
+def configure_environment(args, stub, db_path):
+    urls = stub.urls()
+    os.environ.update({
+        'BOT_TOKEN': '123456:BENCHMARK-TOKEN',
+        'VK_USER_TOKEN': 'benchmark',
+        'VK_GROUP_IDS': ','.join(stub.walls),
+        'VK_EVENT_KEYWORDS': KEYWORDS,
+        'YANDEX_API_KEY': 'benchmark' if not args.no_llm else '',
+        'YANDEX_FOLDER_ID': 'benchmark' if not args.no_llm else '',
+        'VK_API_URL': urls['vk'],
+        'YANDEX_GPT_URL': urls['llm'],
+        'TELEGRAM_API_URL': urls['telegram'],
+        'DB_PATH': db_path,
+        'MIN_EVENT_DATE': f"{args.year}-01-01",
+        'LOCAL_EXTRACTION': 'true' if args.local_tier else 'false',
+    })
+
+
+async def bench_search(main, args, stub):
+    """Полный разбор стен: каждый прогон с пустым кэшем AI и без водяных знаков"""
+    latencies = []
+    events = []
+    tier_counts = {}
+    for _ in range(args.parse_runs):
+        async with main.database.transaction() as db:
+            await db.execute('DELETE FROM ai_cache')
+            await db.execute('DELETE FROM vk_watermarks')
+        parser = main.VKParser(main.vk, vk_client=main.vk_client, ai_analyzer=main.ai_analyzer,
+                               local_extractor=main.local_extractor)
+        started = time.perf_counter()
+        events = await parser.search_events(list(stub.walls), main.VK_EVENT_KEYWORDS)
+        latencies.append(time.perf_counter() - started)
+        tier_counts = parser.tier_counts
+
+    posts = args.groups * args.posts * len(latencies)
+    return summarize(latencies, sum(latencies), posts, unit='posts', events=len(events),
+                     tiers=tier_counts), events
+
+
+async def bench_ingest(main, args):
+    """Потоковый parse_and_save: общее время и время до первой записи в базе"""
+    latencies = []
+    first_rows = []
+    saved = {}
+    for _ in range(args.parse_runs):
+        async with main.database.transaction() as db:
+            await db.execute('DELETE FROM ai_cache')
+            await db.execute('DELETE FROM vk_watermarks')
+            await db.execute('DELETE FROM events')
+        parser = main.VKParser(main.vk, vk_client=main.vk_client, ai_analyzer=main.ai_analyzer,
+                               local_extractor=main.local_extractor)
+        started = time.perf_counter()
+
+        async def watch_first_row():
+            while True:
+                async with main.database.read() as db:
+                    cursor = await db.execute('SELECT 1 FROM events LIMIT 1')
+                    if await cursor.fetchone():
+                        return time.perf_counter() - started
+                await asyncio.sleep(0.01)
+
+        watcher = asyncio.create_task(watch_first_row())
+        saved = await parser.parse_and_save(main.VK_GROUP_IDS, main.VK_EVENT_KEYWORDS)
+        latencies.append(time.perf_counter() - started)
+        if watcher.done():
+            first_rows.append(watcher.result())
+        watcher.cancel()
+
+    posts = args.groups * args.posts * len(latencies)
+    return summarize(latencies, sum(latencies), posts, unit='posts', saved=saved,
+                     first_row_ms=round(min(first_rows) * 1000, 2) if first_rows else None)
+
+
+async def bench_save(main, args, events):
+    """Пакетное сохранение: каждый пакет - новые посты, т.е. только вставки"""
+    parser = main.VKParser(main.vk, vk_client=main.vk_client)
+    localized = {language: await parser.localize_events(events, language) for language in main.SUPPORTED_LANGUAGES}
+    latencies = []
+    rows = 0
+    for batch in range(args.save_batches):
+        for language, language_events in localized.items():
+            batch_events = [{**event, 'source_url': f"{event['source_url']}?batch={batch}"} for event in language_events]
+            started = time.perf_counter()
+            await parser.save_events_to_db(batch_events, language)
+            latencies.append(time.perf_counter() - started)
+            rows += len(batch_events)
+    return summarize(latencies, sum(latencies), rows, unit='rows')
+
+
+async def wait_delivered(main, chat_id):
+    """Дождаться, пока очередь отправит все сообщения чата"""
+    worker = main.message_queue.workers.get(chat_id)
+    if worker:
+        await worker
+
+
+async def bench_events_handler(main, args):
+    from aiogram.types import Message
+
+    async def request(chat_id):
+        if args.cold:
+            main.EventPages.invalidate()
+        message = Message.model_validate({
+            'message_id': 1, 'date': 0, 'text': '/events',
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'bench'},
+        }, context={'bot': main.bot})
+        await main.events_handler(message)
+        await wait_delivered(main, chat_id)
+
+    # У каждого запроса свой чат: меряется бот, а не лимит одного чата
+    calls = [lambda chat_id=chat_id: request(chat_id) for chat_id in range(1, args.requests + 1)]
+    latencies, total = await timed_concurrently(calls, args.concurrency)
+    return summarize(latencies, total, len(latencies), unit='requests', cold_cache=args.cold)
+
+
+async def bench_week_handler(main, args):
+    from aiogram.types import CallbackQuery
+
+    rng = random.Random(args.seed)
+    first_monday = datetime(args.year, 1, 1) + timedelta(days=(7 - datetime(args.year, 1, 1).weekday()) % 7)
+    weeks = [(first_monday + timedelta(weeks=week)).strftime('%Y-%m-%d') for week in range(52)]
+
+    async def request(chat_id, week):
+        if args.cold:
+            main.EventPages.invalidate()
+        callback = CallbackQuery.model_validate({
+            'id': str(chat_id), 'chat_instance': 'bench', 'data': f"week_{week}",
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'bench'},
+            'message': {'message_id': 1, 'date': 0, 'text': 'calendar', 'chat': {'id': chat_id, 'type': 'private'}},
+        }, context={'bot': main.bot})
+        await main.week_handler(callback)
+        await wait_delivered(main, chat_id)
+
+    offset = args.requests + 1
+    calls = [lambda chat_id=chat_id, week=rng.choice(weeks): request(chat_id, week)
+             for chat_id in range(offset, offset + args.requests)]
+    latencies, total = await timed_concurrently(calls, args.concurrency)
+    return summarize(latencies, total, len(latencies), unit='requests', cold_cache=args.cold)
+
+
+async def run(args):
+    stub = await StubServers(StubConfig(
+        groups=args.groups, posts_per_group=args.posts, year=args.year, seed=args.seed,
+        vk=ApiProfile(args.vk_latency, args.vk_error_rate),
+        llm=ApiProfile(args.llm_latency, args.llm_error_rate),
+        telegram=ApiProfile(args.tg_latency, args.tg_error_rate),
+    )).start()
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    configure_environment(args, stub, os.path.join(workdir, 'events.db'))
+
+    # main читает конфигурацию при импорте, поэтому импортируется после настройки окружения
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    import main
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    main.text_translator.translator = StubTranslator()
+
+    report = {'started_at': datetime.now().isoformat(timespec='seconds'), 'config': vars(args), 'scenarios': {}}
+    try:
+        await main.database.connect()
+        await main.init_db()
+        await main.migrate_db()
+
+        report['scenarios']['search_events'], events = await bench_search(main, args, stub)
+        report['scenarios']['parse_and_save'] = await bench_ingest(main, args)
+        report['scenarios']['save_events_to_db'] = await bench_save(main, args, events)
+        report['scenarios']['events_handler'] = await bench_events_handler(main, args)
+        report['scenarios']['week_handler'] = await bench_week_handler(main, args)
+        report['stub'] = {'requests': stub.requests, 'errors': stub.errors}
+    finally:
+        await main.message_queue.close()
+        await main.text_translator.close()
+        await main.vk_client.close()
+        if main.ai_analyzer:
+            await main.ai_analyzer.close()
+        if main.local_extractor:
+            main.local_extractor.close()
+        await main.bot.session.close()
+        await main.database.close()
+        await stub.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=3, help='групп VK в корпусе')
+    parser.add_argument('--posts', type=int, default=200, help='постов на группу')
+    parser.add_argument('--year', type=int, default=datetime.now().year + 1, help='год мероприятий в корпусе')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--vk-latency', type=float, default=50, help='средняя задержка VK, мс')
+    parser.add_argument('--vk-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-latency', type=float, default=300, help='средняя задержка YandexGPT, мс')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--tg-latency', type=float, default=30, help='средняя задержка Bot API, мс')
+    parser.add_argument('--tg-error-rate', type=float, default=0.0)
+    parser.add_argument('--no-llm', action='store_true', help='без YandexGPT: только локальный и резервный разбор')
+    parser.add_argument('--local-tier', action=argparse.BooleanOptionalAction, default=True,
+                        help='локальный разбор Natasha перед моделью')
+    parser.add_argument('--parse-runs', type=int, default=3, help='прогонов search_events и parse_and_save')
+    parser.add_argument('--save-batches', type=int, default=5, help='пакетов save_events_to_db на язык')
+    parser.add_argument('--requests', type=int, default=200, help='запросов к каждому обработчику')
+    parser.add_argument('--concurrency', type=int, default=50, help='одновременных пользователей')
+    parser.add_argument('--cold', action='store_true', help='сбрасывать кэш страниц перед каждым запросом')
+    parser.add_argument('--output', help='файл для JSON (по умолчанию stdout)')
+    parser.add_argument('--verbose', action='store_true', help='не глушить логи бота')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    result = json.dumps(asyncio.run(run(arguments)), ensure_ascii=False, indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output:
+            output.write(result + '\n')
+    else:
+        print(result)
@@ -0,0 +1,189 @@
+"""Локальные заглушки VK API, YandexGPT и Telegram Bot API для бенчмарков
+
+Один aiohttp-сервер обслуживает все три API:
+    /vk/method/wall.get, /vk/method/execute  - стены групп из синтетического корпуса
+    /llm                                     - ответы YandexGPT (одиночные и пакетные)
+    /tg/bot<token>/<method>                  - любые методы Bot API, ответ - сообщение
+
+Задержка и доля ошибок задаются отдельно для каждого API.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+EXECUTE_CALL_RE = re.compile(r'API\.wall\.get\((\{.*?\})\)')
+BATCH_POST_RE = re.compile(r'### id: (\d+)')
+# Методы Bot API, которые возвращают True, а не сообщение
+BOOLEAN_METHODS = {'answercallbackquery', 'setwebhook', 'deletewebhook'}
+
+TEMPLATES = [
+    "Анонс: лекция «{topic}»\nСостоится {day}.{month}.{year} в {hour}:30\nГлавный корпус, ауд. {room}\n"
+    "Приходите, будет интересно! Регистрация по ссылке.",
+    "Мероприятие для студентов: {topic}\n{day} {month_name} в {hour}:00 ждем всех в актовом зале\n"
+    "Вход свободный, регистрация обязательна.",
+    "Друзья, приглашаем на семинар «{topic}»!\nРегистрация до {reg_day} {month_name}, "
+    "сам семинар {day} {month_name} {year}\nПодробности в комментариях.",
+    "Итоги недели: {topic}. Спасибо всем, кто пришел!",
+]
+TOPICS = ['Машинное обучение', 'Металлургия будущего', 'Карьера в IT', 'Квантовые материалы',
+          'Стартапы', 'Хакатон МИСИС', 'Научная конференция', 'Английский клуб']
+MONTH_NAMES = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня', 'июля', 'августа',
+               'сентября', 'октября', 'ноября', 'декабря']
+
+
+@dataclass
+class ApiProfile:
+    """Поведение одного API: средняя задержка в мс и доля ответов с ошибкой"""
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+
+    async def delay(self, rng):
+        if self.latency_ms > 0:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * self.latency_ms / 1000)
+
+    def fails(self, rng):
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+@dataclass
+class StubConfig:
+    groups: int = 3
+    posts_per_group: int = 200
+    year: int = 2026
+    seed: int = 42
+    vk: ApiProfile = field(default_factory=ApiProfile)
+    llm: ApiProfile = field(default_factory=ApiProfile)
+    telegram: ApiProfile = field(default_factory=ApiProfile)
+
+
+def make_corpus(config):
+    """Синтетические стены: {group_id: [посты от новых к старым]}"""
+    rng = random.Random(config.seed)
+    walls = {}
+    for group_number in range(config.groups):
+        group_id = f"bench_group_{group_number}"
+        owner_id = -(100000 + group_number)
+        posts = []
+        for index in range(config.posts_per_group):
+            month = rng.randint(1, 12)
+            day = rng.randint(2, 28)
+            text = rng.choice(TEMPLATES).format(
+                topic=rng.choice(TOPICS), day=day, reg_day=day - 1, month=f"{month:02d}",
+                month_name=MONTH_NAMES[month - 1], year=config.year, hour=rng.randint(10, 19),
+                room=rng.randint(100, 999)
+            )
+            post_id = config.posts_per_group - index
+            posts.append({'id': post_id, 'owner_id': owner_id, 'date': 1760000000 + post_id, 'text': text})
+        walls[group_id] = posts
+    return walls
+
+
+class StubServers:
+    """Сервер-заглушка; счетчики запросов по API доступны в self.requests"""
+    def __init__(self, config):
+        self.config = config
+        self.walls = make_corpus(config)
+        self.rng = random.Random(config.seed)
+        self.requests = {'vk': 0, 'llm': 0, 'telegram': 0}
+        self.errors = {'vk': 0, 'llm': 0, 'telegram': 0}
+        self.message_id = 0
+        self.runner = None
+        self.port = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/vk/method/wall.get', self.vk_wall_get)
+        app.router.add_post('/vk/method/execute', self.vk_execute)
+        app.router.add_post('/llm', self.llm_completion)
+        app.router.add_post('/tg/{bot}/{method}', self.telegram_method)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def urls(self):
+        base = f"http://127.0.0.1:{self.port}"
+        return {'vk': f"{base}/vk/method", 'llm': f"{base}/llm", 'telegram': f"{base}/tg"}
+
+    # === VK ===
+    def wall_page(self, params):
+        key = str(params.get('domain') or params.get('owner_id'))
+        posts = self.walls.get(key, [])
+        offset, count = int(params.get('offset', 0)), int(params.get('count', 20))
+        return {'count': len(posts), 'items': posts[offset:offset + count]}
+
+    async def vk_request(self, build_response):
+        self.requests['vk'] += 1
+        await self.config.vk.delay(self.rng)
+        if self.config.vk.fails(self.rng):
+            self.errors['vk'] += 1
+            return web.json_response({'error': {'error_code': 6, 'error_msg': 'Too many requests per second'}})
+        return web.json_response({'response': build_response()})
+
+    async def vk_wall_get(self, request):
+        data = await request.post()
+        return await self.vk_request(lambda: self.wall_page(data))
+
+    async def vk_execute(self, request):
+        data = await request.post()
+        return await self.vk_request(
+            lambda: [self.wall_page(json.loads(call)) for call in EXECUTE_CALL_RE.findall(data['code'])]
+        )
+
+    # === YandexGPT ===
+    @staticmethod
+    def completion(text):
+        return web.json_response({'result': {'alternatives': [{'message': {'role': 'assistant', 'text': text}}]}})
+
+    async def llm_completion(self, request):
+        self.requests['llm'] += 1
+        body = await request.json()
+        await self.config.llm.delay(self.rng)
+        if self.config.llm.fails(self.rng):
+            self.errors['llm'] += 1
+            return web.Response(status=429, headers={'Retry-After': '0'})
+
+        prompt = body['messages'][-1]['text']
+        answer = {'title': 'Мероприятие', 'date': f"{self.config.year}-11-13", 'time': '18:30', 'location': 'Главный корпус'}
+        post_ids = BATCH_POST_RE.findall(prompt)
+        if post_ids:
+            return self.completion(json.dumps([{'id': int(post_id), **answer} for post_id in post_ids], ensure_ascii=False))
+        return self.completion(json.dumps(answer, ensure_ascii=False))
+
+    # === Telegram Bot API ===
+    async def telegram_method(self, request):
+        self.requests['telegram'] += 1
+        data = await request.post() if request.content_type != 'application/json' else await request.json()
+        await self.config.telegram.delay(self.rng)
+        if self.config.telegram.fails(self.rng):
+            self.errors['telegram'] += 1
+            return web.json_response({'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 0',
+                                      'parameters': {'retry_after': 0}}, status=429)
+
+        method = request.match_info['method'].lower()
+        if method in BOOLEAN_METHODS:
+            return web.json_response({'ok': True, 'result': True})
+
+        chat_id = int(data.get('chat_id', 0))
+        self.message_id += 1
+        message_id = int(data.get('message_id', self.message_id))
+        return web.json_response({'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
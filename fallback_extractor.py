@@ -0,0 +1,148 @@
+"""Резервный разбор поста без AI: дата, время и место за один вызов
+
+Шаблоны собраны один раз при импорте. Все даты в тексте находятся одним
+проходом finditer, затем выбирается первая подходящая по приоритету:
+дд.мм.гггг, дд.мм, «5 мая 2026», «5 мая» (без года - текущий год).
+"""
+import re
+from datetime import datetime
+
+DEFAULT_TIME = "18:00"
+DEFAULT_LOCATION = "МИСИС"
+
+# Формы названий месяцев повторяют прежний шаблон (в том числе «августь»)
+MONTHS = {
+    'январь': 1, 'января': 1,
+    'февраль': 2, 'февраля': 2,
+    'март': 3, 'марта': 3,
+    'апрель': 4, 'апреля': 4,
+    'май': 5, 'мая': 5,
+    'июнь': 6, 'июня': 6,
+    'июль': 7, 'июля': 7,
+    'августь': 8, 'августа': 8,
+    'сентябрь': 9, 'сентября': 9,
+    'октябрь': 10, 'октября': 10,
+    'ноябрь': 11, 'ноября': 11,
+    'декабрь': 12, 'декабря': 12,
+}
+MONTHS_PATTERN = '|'.join(sorted(MONTHS, key=len, reverse=True))
+
+# Все варианты даты начинаются с числа дня - так regex быстро пропускает текст без цифр.
+# Полная дата проверяется раньше короткой: «13.11.2026» не разбивается на «13.11» и остаток
+DATE_RE = re.compile(
+    r'(?P<day>\d{1,2})(?:'
+    r'\.(?P<month>\d{1,2})\.(?P<year>\d{4})'
+    r'|\s+(?P<word_month>' + MONTHS_PATTERN + r')(?:\s+(?P<word_year>\d{4}))?'
+    r'|\.(?P<short_month>\d{1,2})(?!\.\d)'
+    r')'
+)
+
+TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
+HOURS_RE = re.compile(r'(\d{1,2})\s*[чh]\s*(\d{1,2})')
+
+# Раньше строка сравнивалась в нижнем регистре, и «МИСИС» никогда не совпадал - так и оставлено
+LOCATION_KEYWORDS = (
+    'ауд.', 'аудитория', 'корпус', 'МИСИС', 'лаборатория', 'зал',
+    'комната', 'кабинет', 'актовый', 'конференц', 'лекторий', 'актовый зал'
+)
+LOCATION_RE = re.compile('|'.join(re.escape(keyword) for keyword in LOCATION_KEYWORDS if keyword == keyword.lower()))
+
+# Порядок проверки отложенных дат
+SHORT, WORD_WITH_YEAR, WORD = range(3)
+
+
+def extract_date(text, min_date, now=None):
+    """Первая дата не раньше min_date в формате ГГГГ-ММ-ДД, иначе сама min_date"""
+    return find_date(text.lower(), min_date, now or datetime.now())
+
+
+def extract_time(text):
+    """Время ЧЧ:ММ; «18ч30» и «18 h 30» тоже понимаются"""
+    return find_time(text.lower())
+
+
+def extract_location(text):
+    """Первая строка поста, где упоминается аудитория, корпус, зал и т.п."""
+    return find_location(text, text.lower())
+
+
+def extract(text, min_date, now=None):
+    """(дата, время, место) поста; текст приводится к нижнему регистру один раз"""
+    lowered = text.lower()
+    return find_date(lowered, min_date, now or datetime.now()), find_time(lowered), find_location(text, lowered)
+
+
+def find_date(lowered, min_date, now):
+    # Полные даты проверяются сразу, остальные откладываются по своему приоритету
+    candidates = ([], [], [])
+
+    for match in DATE_RE.finditer(lowered):
+        day = match.group('day')
+        if match.group('year'):
+            # Полная дата важнее всех остальных - первую подходящую можно вернуть сразу
+            date_str = valid_date(match.group('year'), match.group('month'), day, min_date)
+            if date_str:
+                return date_str
+        elif match.group('word_month'):
+            month = MONTHS[match.group('word_month')]
+            if match.group('word_year'):
+                candidates[WORD_WITH_YEAR].append((match.group('word_year'), month, day))
+            # «5 мая 2024» подходит и как «5 мая» текущего года
+            candidates[WORD].append((now.year, month, day))
+        else:
+            day, month = int(day), int(match.group('short_month'))
+            candidates[SHORT].append((infer_year(month, day, now), month, day))
+
+    for group in candidates:
+        for year, month, day in group:
+            date_str = valid_date(year, month, day, min_date)
+            if date_str:
+                return date_str
+
+    return min_date.strftime('%Y-%m-%d')
+
+
+def infer_year(month, day, now):
+    """Год для даты без года: если в этом году она уже прошла, значит следующий"""
+    return now.year + 1 if (month, day) < (now.month, now.day) else now.year
+
+
+def valid_date(year, month, day, min_date):
+    """Дата ГГГГ-ММ-ДД, если она существует и не раньше min_date"""
+    try:
+        date_obj = datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    return date_obj.strftime('%Y-%m-%d') if date_obj >= min_date else None
+
+
+def find_time(lowered):
+    return find_explicit_time(lowered) or DEFAULT_TIME
+
+
+def find_explicit_time(lowered):
+    """Время, если оно есть в тексте, иначе None"""
+    match = TIME_RE.search(lowered) or HOURS_RE.search(lowered)
+    if match:
+        hours, minutes = match.groups()
+        return f"{int(hours):02d}:{int(minutes):02d}"
+    return None
+
+
+def find_location(text, lowered):
+    return find_explicit_location(text, lowered) or DEFAULT_LOCATION
+
+
+def find_explicit_location(text, lowered):
+    """Строка с местом, если она есть в тексте, иначе None"""
+    match = LOCATION_RE.search(lowered)
+    if not match:
+        return None
+    return line_at(text, lowered, match.start())
+
+
+def line_at(text, lowered, position):
+    """Строка оригинального текста, в которой находится позиция"""
+    # lower() не добавляет и не убирает переводы строк, поэтому номер строки совпадает с оригиналом
+    line_number = lowered.count('\n', 0, position)
+    return text.split('\n')[line_number].strip()
@@ -2,19 +2,36 @@ import asyncio
 import logging
 import os
 import aiohttp
+from aiohttp import web
 import json
+import hashlib
+import hmac
+import html
 import aiosqlite
 import re
 import random
+import inspect
+import functools
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timedelta
 from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
+from aiogram.types import Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo, Update
+from aiogram.webhook.aiohttp_server import setup_application
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 import vk_api
 from vk_api.utils import get_random_id
 from googletrans import Translator
 
+import fallback_extractor
+
 # Загрузка переменных среды
 from dotenv import load_dotenv
 load_dotenv()
@@ -28,15 +45,121 @@ logger = logging.getLogger(__name__)
 
 # === КОНФИГУРАЦИЯ ===
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Свой адрес Bot API (локальный сервер или заглушка для бенчмарков), по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
 VK_USER_TOKEN = os.getenv('VK_USER_TOKEN')
 VK_GROUP_IDS = [group.strip() for group in os.getenv('VK_GROUP_IDS', '').split(',') if group.strip()]
 VK_EVENT_KEYWORDS = [keyword.strip() for keyword in os.getenv('VK_EVENT_KEYWORDS', '').split(',') if keyword.strip()]
+# Локальный разбор постов Natasha перед обращением к YandexGPT
+LOCAL_EXTRACTION = os.getenv('LOCAL_EXTRACTION', 'true').lower() == 'true'
+# Добавлять ли к ключевым словам все их словоформы (pymorphy3)
+KEYWORD_LEMMAS = os.getenv('KEYWORD_LEMMAS', 'false').lower() == 'true'
+# Повторы анонсов: репосты и посты, чей SimHash отличается не больше чем на DEDUP_MAX_DISTANCE бит
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', '3'))
+DEDUP_MIN_TOKENS = int(os.getenv('DEDUP_MIN_TOKENS', '8'))
+DEDUP_WINDOW_DAYS = float(os.getenv('DEDUP_WINDOW_DAYS', '60'))
 YANDEX_API_KEY = os.getenv('YANDEX_API_KEY')
 YANDEX_FOLDER_ID = os.getenv('YANDEX_FOLDER_ID')
+YANDEX_GPT_URL = os.getenv('YANDEX_GPT_URL', 'https://llm.api.cloud.yandex.net/foundationModels/v1/completion')
+YANDEX_GPT_MODEL = os.getenv('YANDEX_GPT_MODEL', 'yandexgpt-lite')
+AI_CONCURRENCY = int(os.getenv('AI_CONCURRENCY', '4'))
+AI_TOKENS_PER_SECOND = float(os.getenv('AI_TOKENS_PER_SECOND', '5000'))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))
+AI_BATCH_MODE = os.getenv('AI_BATCH_MODE', 'true').lower() == 'true'
+AI_BATCH_MAX_POSTS = int(os.getenv('AI_BATCH_MAX_POSTS', '8'))
+AI_BATCH_MAX_INPUT_TOKENS = int(os.getenv('AI_BATCH_MAX_INPUT_TOKENS', '6000'))
+
+# Переводы
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', '2'))
+TRANSLATION_BATCH_SIZE = int(os.getenv('TRANSLATION_BATCH_SIZE', '20'))
+TRANSLATION_CACHE_FLUSH_SECONDS = float(os.getenv('TRANSLATION_CACHE_FLUSH_SECONDS', '30'))
+TRANSLATION_MEMORY_CACHE_SIZE = int(os.getenv('TRANSLATION_MEMORY_CACHE_SIZE', '2000'))
+TRANSLATION_CACHE_MAX_ROWS = int(os.getenv('TRANSLATION_CACHE_MAX_ROWS', '50000'))
+TRANSLATION_CACHE_TTL_DAYS = float(os.getenv('TRANSLATION_CACHE_TTL_DAYS', '180'))
+
+# Кэш ответов AI
+AI_CACHE_TTL_DAYS = float(os.getenv('AI_CACHE_TTL_DAYS', '30'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '10000'))
+
+# Параметры доступа к VK API
+VK_API_URL = os.getenv('VK_API_URL', 'https://api.vk.com/method')
+VK_API_VERSION = os.getenv('VK_API_VERSION', '5.131')
+VK_FETCH_MODE = os.getenv('VK_FETCH_MODE', 'aiohttp')  # aiohttp или thread
+VK_CONCURRENCY = int(os.getenv('VK_CONCURRENCY', '3'))
+VK_REQUESTS_PER_SECOND = float(os.getenv('VK_REQUESTS_PER_SECOND', '3'))
+VK_BATCH_MODE = os.getenv('VK_BATCH_MODE', 'execute')  # execute или single
+VK_EXECUTE_BATCH_SIZE = min(int(os.getenv('VK_EXECUTE_BATCH_SIZE', '25')), 25)
+VK_PAGE_SIZE = min(int(os.getenv('VK_PAGE_SIZE', '100')), 100)
+VK_MAX_PAGES = int(os.getenv('VK_MAX_PAGES', '10'))
+
+# База данных
+DB_PATH = os.getenv('DB_PATH', 'events.db')
+DB_READERS = int(os.getenv('DB_READERS', '2'))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+USER_LANGUAGE_CACHE_SIZE = int(os.getenv('USER_LANGUAGE_CACHE_SIZE', '10000'))
+
+# Лимиты Telegram на отправку: в один чат и суммарно по боту.
+# Лимиты действуют внутри процесса: при нескольких воркерах за прокси общий лимит делится между ними
+TELEGRAM_CHAT_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_CHAT_MESSAGES_PER_SECOND', '1'))
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '30'))
+TELEGRAM_SEND_RETRIES = int(os.getenv('TELEGRAM_SEND_RETRIES', '5'))
+# Предел длины сообщения в Bot API
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Фоновый парсинг: интервал и случайный разброс, чтобы запуски не совпадали с чужими
+PARSE_INTERVAL_MINUTES = float(os.getenv('PARSE_INTERVAL_MINUTES', '60'))
+PARSE_JITTER_SECONDS = float(os.getenv('PARSE_JITTER_SECONDS', '300'))
+PARSE_RUNS_KEEP = int(os.getenv('PARSE_RUNS_KEEP', '100'))
+# Плановый парсинг в этом процессе; при нескольких воркерах включается только на одном из них
+PARSE_SCHEDULE = os.getenv('PARSE_SCHEDULE', 'true').lower() == 'true'
+# Аренда парсинга в БД: один запуск на все процессы; продлевается, пока парсинг идет
+PARSE_LEASE_SECONDS = float(os.getenv('PARSE_LEASE_SECONDS', '300'))
+PARSE_LEASE_POLL_SECONDS = float(os.getenv('PARSE_LEASE_POLL_SECONDS', '5'))
+
+# Потоковый парсинг: размер очередей между этапами, число воркеров и размер пачек каждого этапа
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '200'))
+INGEST_FETCH_WORKERS = int(os.getenv('INGEST_FETCH_WORKERS', str(VK_CONCURRENCY)))
+INGEST_FILTER_WORKERS = int(os.getenv('INGEST_FILTER_WORKERS', '1'))
+INGEST_EXTRACT_WORKERS = int(os.getenv('INGEST_EXTRACT_WORKERS', str(AI_CONCURRENCY)))
+INGEST_EXTRACT_BATCH = int(os.getenv('INGEST_EXTRACT_BATCH', str(AI_BATCH_MAX_POSTS)))
+INGEST_TRANSLATE_WORKERS = int(os.getenv('INGEST_TRANSLATE_WORKERS', '2'))
+INGEST_TRANSLATE_BATCH = int(os.getenv('INGEST_TRANSLATE_BATCH', '20'))
+# Сохранение пачкой: не больше INGEST_PERSIST_BATCH мероприятий и не дольше INGEST_PERSIST_INTERVAL секунд ожидания
+INGEST_PERSIST_BATCH = int(os.getenv('INGEST_PERSIST_BATCH', '50'))
+INGEST_PERSIST_INTERVAL = float(os.getenv('INGEST_PERSIST_INTERVAL', '2'))
+
+# Метрики в формате Prometheus: http://METRICS_HOST:METRICS_PORT/metrics (порт 0 - не запускать)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Режим получения обновлений: polling (getUpdates) или webhook (aiohttp-сервер)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+# Публичный адрес бота за прокси, например https://bot.example.com (пусто - вебхук не регистрируется)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+# Очередь принятых обновлений и число параллельных обработчиков
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '16'))
+
+# Сколько мероприятий показывать в одном сообщении
+EVENTS_PAGE_SIZE = int(os.getenv('EVENTS_PAGE_SIZE', '5'))
+
+# Кэш готовых карточек мероприятий и страниц (сбрасывается при сохранении новых данных)
+RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', '5000'))
+PAGE_CACHE_SIZE = int(os.getenv('PAGE_CACHE_SIZE', '500'))
 
 # Минимальная дата для мероприятий
 MIN_EVENT_DATE = datetime.fromisoformat(os.getenv('MIN_EVENT_DATE', '2025-11-01'))
 
+# Языки, на которых хранятся мероприятия; посты в VK пишутся на первом из них
+SUPPORTED_LANGUAGES = ['ru', 'en']
+SOURCE_LANGUAGE = SUPPORTED_LANGUAGES[0]
+
 # Проверка обязательных переменных
 if not all([BOT_TOKEN, VK_USER_TOKEN, VK_GROUP_IDS, VK_EVENT_KEYWORDS]):
     logger.error("❌ Отсутствуют обязательные переменные!")
@@ -48,13 +171,500 @@ if not all([BOT_TOKEN, VK_USER_TOKEN, VK_GROUP_IDS, VK_EVENT_KEYWORDS]):
     exit(1)
 
 # Инициализация бота Telegram с увеличенным таймаутом
-bot = Bot(token=BOT_TOKEN, timeout=60)
+telegram_session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=telegram_session, timeout=60)
 dp = Dispatcher()
 
 # Инициализация VK API
 vk_session = vk_api.VkApi(token=VK_USER_TOKEN)
 vk = vk_session.get_api()
 
+# === ОГРАНИЧЕНИЕ ЧАСТОТЫ ЗАПРОСОВ ===
+class TokenBucket:
+    """Асинхронный token bucket: не больше rate единиц в секунду, запас до capacity"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        """Дождаться, пока в ведре наберется amount единиц, и забрать их"""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+# === LRU КЭШ ===
+class LRUCache:
+    """Ограниченный по размеру словарь: при переполнении вытесняются давно не использованные ключи"""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.data:
+            return default
+        self.data.move_to_end(key)
+        return self.data[key]
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.data.pop(key, default)
+
+    def clear(self):
+        self.data.clear()
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+# === МЕТРИКИ ===
+class Metrics:
+    """Счетчики и гистограммы в памяти процесса, отдаются в текстовом формате Prometheus"""
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        # {(имя, метки): значение}
+        self.counters = {}
+        # {(имя, метки): [попадания в корзины..., сумма, количество]}
+        self.histograms = {}
+        # {имя: функция текущего значения}
+        self.gauges = {}
+        self.descriptions = {}
+        self.runner = None
+
+    def describe(self, name, kind, text):
+        self.descriptions[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(self.BUCKETS) + 1) + [0.0, 0]
+        histogram[bisect_left(self.BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def gauge(self, name, text, function):
+        self.describe(name, 'gauge', text)
+        self.gauges[name] = function
+
+    @contextmanager
+    def track(self, stage):
+        """Время этапа, число вызовов и ошибок"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('bot_stage_errors_total', stage=stage)
+            raise
+        finally:
+            self.inc('bot_stage_calls_total', stage=stage)
+            self.observe('bot_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+
+    def stage_summary(self, stage):
+        """(вызовов, ошибок, среднее в мс, p95 в мс) для /status"""
+        labels = (('stage', stage),)
+        histogram = self.histograms.get(('bot_stage_duration_seconds', labels))
+        if not histogram:
+            return None
+        count, total = histogram[-1], histogram[-2]
+        errors = self.counters.get(('bot_stage_errors_total', labels), 0)
+        return count, errors, total / count * 1000, self.quantile(histogram, 0.95) * 1000
+
+    def quantile(self, histogram, q):
+        """Оценка квантиля по корзинам с линейной интерполяцией, как histogram_quantile"""
+        rank = q * histogram[-1]
+        seen = 0
+        lower = 0.0
+        for bound, hits in zip(self.BUCKETS, histogram):
+            if seen + hits >= rank and hits:
+                return lower + (bound - lower) * (rank - seen) / hits
+            seen += hits
+            lower = bound
+        return self.BUCKETS[-1]
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        """Все метрики в формате Prometheus text exposition 0.0.4"""
+        series = {}
+        for (name, labels), value in self.counters.items():
+            series.setdefault(name, []).append(f"{name}{self.format_labels(labels)} {value}")
+        for (name, labels), histogram in self.histograms.items():
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, hits in zip(self.BUCKETS + ('+Inf',), histogram):
+                cumulative += hits
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {histogram[-1]}")
+        for name, function in self.gauges.items():
+            series.setdefault(name, []).append(f"{name} {function()}")
+
+        output = []
+        for name in sorted(series):
+            kind, text = self.descriptions.get(name, ('untyped', name))
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+    async def handle(self, request):
+        return web.Response(body=self.render().encode('utf-8'),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def start_server(self, host=METRICS_HOST, port=METRICS_PORT):
+        """HTTP-эндпоинт /metrics; без METRICS_PORT не запускается"""
+        if not port or self.runner:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        logger.info(f"📈 Метрики доступны на http://{host}:{port}/metrics")
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics = Metrics()
+metrics.describe('bot_stage_calls_total', 'counter', 'Вызовы этапов: VK, модель, перевод, БД, Telegram')
+metrics.describe('bot_stage_errors_total', 'counter', 'Ошибки этапов')
+metrics.describe('bot_stage_duration_seconds', 'histogram', 'Длительность этапов в секундах')
+metrics.describe('bot_cache_requests_total', 'counter', 'Обращения к кэшам по результату')
+metrics.describe('bot_posts_total', 'counter', 'Посты по этапам разбора: новые, с ключевыми словами, повторы, разобранные')
+metrics.describe('bot_posts_extracted_total', 'counter', 'Разобранные посты по уровню: Natasha, модель, резервный парсинг')
+metrics.describe('bot_events_saved_total', 'counter', 'Сохраненные мероприятия по языку и результату')
+metrics.describe('bot_telegram_messages_total', 'counter', 'Исходящие сообщения Telegram по результату')
+metrics.describe('bot_webhook_updates_total', 'counter', 'Обновления, пришедшие через вебхук, по результату')
+
+# === ОЧЕРЕДЬ ИСХОДЯЩИХ СООБЩЕНИЙ ===
+class MessageQueue:
+    """Отправка сообщений через очередь: лимит на чат и на бота, RetryAfter, порядок внутри чата"""
+    def __init__(self, chat_rate=TELEGRAM_CHAT_MESSAGES_PER_SECOND, chat_burst=TELEGRAM_CHAT_BURST,
+                 global_rate=TELEGRAM_MESSAGES_PER_SECOND, max_retries=TELEGRAM_SEND_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate)
+        # Ведра чатов переживают паузы между сообщениями, чтобы лимит не обнулялся
+        self.chat_buckets = LRUCache(USER_LANGUAGE_CACHE_SIZE)
+        self.queues = {}
+        self.workers = {}
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def enqueue(self, chat_id, method, params):
+        """Поставить вызов метода бота в очередь чата; возвращает future с результатом"""
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(chat_id, deque()).append((method, params, future))
+        if chat_id not in self.workers:
+            self.workers[chat_id] = asyncio.create_task(self.run_chat(chat_id))
+        return future
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.enqueue(chat_id, bot.send_message, dict(chat_id=chat_id, text=text, **kwargs))
+
+    def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        return self.enqueue(chat_id, bot.edit_message_text, dict(chat_id=chat_id, message_id=message_id, text=text, **kwargs))
+
+    def chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    async def run_chat(self, chat_id):
+        """Один обработчик на чат: сообщения уходят строго по порядку"""
+        queue = self.queues[chat_id]
+        bucket = self.chat_bucket(chat_id)
+        attempt = 0
+        try:
+            while queue:
+                method, params, future = queue[0]
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                try:
+                    with metrics.track('telegram_send'):
+                        result = await method(**params)
+                except TelegramRetryAfter as e:
+                    if attempt < self.max_retries:
+                        # Сообщение остается первым в очереди чата - порядок не нарушается
+                        attempt += 1
+                        self.retried += 1
+                        metrics.inc('bot_telegram_messages_total', result='retried')
+                        logger.warning(f"⏳ Telegram просит подождать {e.retry_after} с (чат {chat_id})")
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    result = None
+                    self.failed += 1
+                    metrics.inc('bot_telegram_messages_total', result='failed')
+                    logger.error(f"❌ Сообщение в чат {chat_id} не отправлено: {e}")
+                except Exception as e:
+                    result = None
+                    self.failed += 1
+                    metrics.inc('bot_telegram_messages_total', result='failed')
+                    logger.error(f"❌ Сообщение в чат {chat_id} не отправлено: {e}")
+                else:
+                    self.sent += 1
+                    metrics.inc('bot_telegram_messages_total', result='sent')
+
+                queue.popleft()
+                attempt = 0
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.workers.pop(chat_id, None)
+            if not queue:
+                self.queues.pop(chat_id, None)
+
+    async def close(self, timeout=10):
+        """Дождаться отправки накопившихся сообщений"""
+        workers = list(self.workers.values())
+        if not workers:
+            return
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+message_queue = MessageQueue()
+metrics.gauge('bot_telegram_queue_depth', 'Сообщения, ожидающие отправки',
+              lambda: sum(len(queue) for queue in message_queue.queues.values()))
+
+# === БАЗА ДАННЫХ: ОБЩИЕ СОЕДИНЕНИЯ ===
+class Database:
+    """Долгоживущие соединения с SQLite в режиме WAL: одно на запись и несколько на чтение"""
+    def __init__(self, path=DB_PATH, readers=DB_READERS):
+        self.path = path
+        self.readers_count = readers
+        self.writer = None
+        self.readers = []
+        self.next_reader = 0
+        self.connect_lock = asyncio.Lock()
+        # SQLite допускает одного писателя - транзакции выстраиваются в очередь здесь, а не в файле
+        self.write_lock = asyncio.Lock()
+
+    async def open_connection(self):
+        # cached_statements: повторяющиеся запросы не компилируются заново
+        connection = await aiosqlite.connect(self.path, cached_statements=256)
+        await connection.execute('PRAGMA journal_mode=WAL')
+        await connection.execute('PRAGMA synchronous=NORMAL')
+        await connection.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        await connection.execute('PRAGMA busy_timeout=5000')
+        return connection
+
+    async def connect(self):
+        """Открытие соединений, повторный вызов ничего не делает"""
+        async with self.connect_lock:
+            if self.writer is not None:
+                return
+            self.writer = await self.open_connection()
+            self.readers = [await self.open_connection() for _ in range(self.readers_count)]
+            logger.info(f"✅ Соединения с БД открыты: 1 на запись, {len(self.readers)} на чтение")
+
+    async def close(self):
+        """Закрытие всех соединений при остановке бота"""
+        for connection in [self.writer, *self.readers]:
+            if connection is not None:
+                await connection.close()
+        self.writer = None
+        self.readers = []
+
+    @asynccontextmanager
+    async def read(self):
+        """Соединение для чтения; в WAL читатели не ждут писателя"""
+        if self.writer is None:
+            await self.connect()
+        if not self.readers:
+            yield self.writer
+            return
+        connection = self.readers[self.next_reader % len(self.readers)]
+        self.next_reader += 1
+        yield connection
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Соединение для записи: commit при успехе, rollback при ошибке"""
+        if self.writer is None:
+            await self.connect()
+        async with self.write_lock:
+            try:
+                yield self.writer
+                await self.writer.commit()
+            except BaseException:
+                await self.writer.rollback()
+                raise
+
+database = Database()
+
+# Частые запросы: одинаковый текст SQL попадает в кэш подготовленных выражений
+SQL_GET_USER_LANGUAGE = 'SELECT language FROM user_settings WHERE user_id = ?'
+SQL_SET_USER_LANGUAGE = 'INSERT OR REPLACE INTO user_settings (user_id, language) VALUES (?, ?)'
+SQL_GET_USER_SETTINGS_VERSION = 'SELECT version FROM user_settings_version WHERE id = 1'
+
+# Аренда парсинга: занять можно свободную или просроченную
+SQL_ACQUIRE_PARSE_LEASE = '''
+    INSERT INTO parse_lease (id, owner, expires_at) VALUES (1, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+    WHERE parse_lease.expires_at < ?
+'''
+SQL_GET_PARSE_LEASE_OWNER = 'SELECT owner FROM parse_lease WHERE id = 1 AND expires_at >= ?'
+SQL_RENEW_PARSE_LEASE = 'UPDATE parse_lease SET expires_at = ? WHERE id = 1 AND owner = ?'
+SQL_RELEASE_PARSE_LEASE = 'DELETE FROM parse_lease WHERE id = 1 AND owner = ?'
+# Поля мероприятия, которые пишутся при сохранении (кроме ключа source_url + language)
+EVENT_FIELDS = ('title', 'description', 'event_date', 'event_time', 'location', 'source', 'tags', 'image_path')
+SQL_UPSERT_EVENT = f'''
+    INSERT INTO events ({', '.join(EVENT_FIELDS)}, source_url, language)
+    VALUES ({', '.join('?' for _ in EVENT_FIELDS)}, ?, ?)
+    ON CONFLICT (source_url, language) DO UPDATE SET
+        {', '.join(f'{field} = excluded.{field}' for field in EVENT_FIELDS)}
+'''
+# Безопасное число параметров в одном запросе для старых сборок SQLite
+SQL_MAX_VARIABLES = 900
+
+# Страницы мероприятий: keyset по (event_date, event_time, id), каждая страница - один проход по индексу
+SQL_EVENT_PAGE_COLUMNS = 'id, title, description, event_date, event_time, location, image_path, source_url'
+SQL_COUNT_EVENTS = '''
+    SELECT COUNT(*) FROM events
+    WHERE language = ? AND event_date BETWEEN ? AND ?
+'''
+SQL_EVENTS_FIRST_PAGE = f'''
+    SELECT {SQL_EVENT_PAGE_COLUMNS} FROM events
+    WHERE language = ? AND event_date BETWEEN ? AND ?
+    ORDER BY event_date, event_time, id
+    LIMIT ?
+'''
+# Ключ курсора читается отдельно и подставляется значениями: с подзапросом SQLite
+# ищет по индексу только диапазон дат и фильтрует каждую строку до курсора
+SQL_EVENT_CURSOR = '''
+    SELECT event_date, event_time, id FROM events WHERE id = ? AND language = ?
+'''
+SQL_EVENTS_PAGE_AFTER = f'''
+    SELECT {SQL_EVENT_PAGE_COLUMNS} FROM events
+    WHERE language = ? AND event_date <= ? AND (event_date, event_time, id) > (?, ?, ?)
+    ORDER BY event_date, event_time, id
+    LIMIT ?
+'''
+SQL_EVENTS_PAGE_BEFORE = f'''
+    SELECT {SQL_EVENT_PAGE_COLUMNS} FROM events
+    WHERE language = ? AND event_date >= ? AND (event_date, event_time, id) < (?, ?, ?)
+    ORDER BY event_date DESC, event_time DESC, id DESC
+    LIMIT ?
+'''
+
+# === АСИНХРОННЫЙ КЛИЕНТ VK API ===
+class VKApiError(Exception):
+    """Ошибка, которую вернул VK API"""
+    def __init__(self, code, message):
+        super().__init__(f"VK API error {code}: {message}")
+        self.code = code
+
+class AsyncVKClient:
+    """Неблокирующий клиент VK API: общая aiohttp-сессия или ограниченный пул потоков"""
+    TOO_MANY_REQUESTS = 6
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, token=None, sync_api=None, mode=VK_FETCH_MODE,
+                 concurrency=VK_CONCURRENCY, requests_per_second=VK_REQUESTS_PER_SECOND):
+        self.token = token
+        self.sync_api = sync_api
+        # Без токена ходить в VK напрямую нельзя - остается только синхронный клиент в потоках
+        self.mode = mode if token else 'thread'
+        if self.mode == 'thread' and sync_api is None:
+            raise ValueError("Для режима 'thread' нужен синхронный клиент vk_api")
+
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.executor = None
+        if sync_api is not None:
+            self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='vk')
+        self.session = None
+
+    async def get_session(self):
+        """Общая aiohttp-сессия, создается при первом запросе"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return self.session
+
+    async def call(self, method, **params):
+        """Вызов метода VK API с ограничением параллельности и частоты запросов"""
+        for attempt in range(self.MAX_ATTEMPTS):
+            async with self.semaphore:
+                await self.rate_limiter.acquire()
+                try:
+                    with metrics.track('vk_api'):
+                        if self.mode == 'thread':
+                            loop = asyncio.get_running_loop()
+                            return await loop.run_in_executor(self.executor, self._call_sync, method, params)
+                        return await self._call_http(method, params)
+                except VKApiError as e:
+                    if e.code != self.TOO_MANY_REQUESTS or attempt == self.MAX_ATTEMPTS - 1:
+                        raise
+            logger.warning(f"⏳ VK ограничил частоту запросов, повтор {method} через {attempt + 1} с")
+            await asyncio.sleep(attempt + 1)
+
+    async def _call_http(self, method, params):
+        session = await self.get_session()
+        data = {key: str(value) for key, value in params.items()}
+        data.update(access_token=self.token, v=VK_API_VERSION)
+
+        async with session.post(f"{VK_API_URL}/{method}", data=data) as response:
+            payload = await response.json(content_type=None)
+
+        if 'error' in payload:
+            error = payload['error']
+            raise VKApiError(error.get('error_code'), error.get('error_msg'))
+        return payload['response']
+
+    def _call_sync(self, method, params):
+        func = self.sync_api
+        for part in method.split('.'):
+            func = getattr(func, part)
+        try:
+            return func(**params)
+        except vk_api.exceptions.ApiError as e:
+            raise VKApiError(e.code, e.error.get('error_msg'))
+
+    async def close(self):
+        """Закрытие сессии и пула потоков при остановке бота"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+# Общий клиент VK для всех парсеров
+vk_client = AsyncVKClient(VK_USER_TOKEN, sync_api=vk)
+
 # === СИСТЕМА ПЕРЕВОДОВ ===
 class TranslationService:
     def __init__(self):
@@ -76,10 +686,21 @@ class TranslationService:
                 'choose_action': "🏠 Выберите действие из меню:",
                 'events_section': "📅 Раздел мероприятий:",
                 'about_text': "🤖 О боте\n\nЭтот бот создан для студентов МИСИС, чтобы упростить поиск мероприятий.\n\nТехнологии:\n• Python + Aiogram\n• VK API для парсинга мероприятий\n• Yandex GPT для анализа постов\n• SQLite для хранения данных\n\nИсточники информации:\n• Официальные студенческие сообщества МИСИС в ВК\nБот автоматически обновляет информацию каждый час!",
-                'status_text': "🔧 Статус системы:\n• 🤖 Бот: {bot_status}\n• 🔑 VK API: {vk_status}\n• 🤖 AI Анализатор: {ai_status}\n• 💾 База данных: {db_status}\n\nВсе системы работают нормально! 🚀",
+                'status_text': "🔧 Статус системы:\n• 🤖 Бот: {bot_status}\n• 🔑 VK API: {vk_status}\n• 🤖 AI Анализатор: {ai_status}\n• 🧠 Кэш AI: {ai_cache_hits} из кэша / {ai_cache_misses} запросов к модели\n• 🧩 Разбор постов: Natasha {local_tier}, AI {ai_tier}, без AI {fallback_tier}\n• 💾 База данных: {db_status}\n• 🔄 Последнее обновление: {last_parse}\n{stages}\nВсе системы работают нормально! 🚀",
                 'help_text': "📖 Бот мероприятий МИСИС\n\nПарсит группы VK:\n{groups}\n\nИщет по ключевым словам:\n{keywords}\n\nДоступные команды:\n• 📅 Мероприятия - все мероприятия (подробно)\n• 🗓️ Календарь - календарь по неделям\n• 🔄 Обновить - запустить парсинг\n• 📊 Статус - статус системы\n• ❓ Помощь - эта справка\n• ℹ️ О боте - информация о боте\n• 🌍 Язык - сменить язык",
                 'parsing_started': "🔍 Запуск парсинга мероприятий из VK...",
-                'parsing_completed': "✅ Парсинг завершен!\nСохранено мероприятий: {saved_count}\nПроверено групп: {groups_count}\nКлючевых слов: {keywords_count}",
+                'parsing_in_progress': "⏳ Обновление уже идет, результат придет, как только оно завершится...",
+                'last_parse_never': "еще не было",
+                'stage_line': "• ⏱ {stage}: {calls} выз., ошибок {errors}, в среднем {avg} мс, p95 {p95} мс",
+                'stage_vk_api': "VK API",
+                'stage_llm_request': "YandexGPT",
+                'stage_translate': "Перевод",
+                'stage_db_save': "Сохранение в БД",
+                'stage_telegram_send': "Отправка в Telegram",
+                'last_parse_running': "идет сейчас",
+                'last_parse_ok': "{finished_at} за {duration} с, новых {inserted}, обновлено {updated}",
+                'last_parse_failed': "{finished_at} с ошибкой",
+                'parsing_completed': "✅ Парсинг завершен!\nСохранено мероприятий: {saved_count}\nОбновлено мероприятий: {updated_count}\nПроверено групп: {groups_count}\nКлючевых слов: {keywords_count}",
                 'no_new_events': "✅ Новых мероприятий не найдено",
                 'parsing_error': "❌ Ошибка при парсинге",
                 'events_found': "🎓 Найдено мероприятий: {count}",
@@ -91,9 +712,11 @@ class TranslationService:
                 'searching_week': "🔍 Ищу мероприятия на неделю:\n📅 {start_date} - {end_date}",
                 'choose_language': "🌍 Выберите язык / Choose language:",
                 'language_changed': "✅ Язык изменен на русский!",
+                'prev_page': "⬅️ Назад",
+                'next_page': "Далее ➡️",
 
                 # Формат мероприятия
-                'event_format': "{title}\n📅 {date} в {time}\n📍 {location}\n📝 {description}\n🔗 [Ссылка на пост]({url})",
+                'event_format': "{title}\n📅 {date} в {time}\n📍 {location}\n📝 {description}\n🔗 <a href=\"{url}\">Ссылка на пост</a>",
 
                 # Статусы
                 'yes': '✅',
@@ -116,10 +739,21 @@ class TranslationService:
                 'choose_action': "🏠 Choose an action from the menu:",
                 'events_section': "📅 Events section:",
                 'about_text': "🤖 About the Bot\n\nThis bot was created for MISIS students to simplify event search.\n\nTechnologies:\n• Python + Aiogram\n• VK API for event parsing\n• Yandex GPT for post analysis\n• SQLite for data storage\n\nInformation sources:\n• Official MISIS student communities in VK\nThe bot automatically updates information every hour!",
-                'status_text': "🔧 System status:\n• 🤖 Bot: {bot_status}\n• 🔑 VK API: {vk_status}\n• 🤖 AI Analyzer: {ai_status}\n• 💾 Database: {db_status}\n\nAll systems are working normally! 🚀",
+                'status_text': "🔧 System status:\n• 🤖 Bot: {bot_status}\n• 🔑 VK API: {vk_status}\n• 🤖 AI Analyzer: {ai_status}\n• 🧠 AI cache: {ai_cache_hits} hits / {ai_cache_misses} misses\n• 🧩 Posts parsed: Natasha {local_tier}, AI {ai_tier}, without AI {fallback_tier}\n• 💾 Database: {db_status}\n• 🔄 Last update: {last_parse}\n{stages}\nAll systems are working normally! 🚀",
                 'help_text': "📖 MISIS Events Bot\n\nParses VK groups:\n{groups}\n\nSearches by keywords:\n{keywords}\n\nAvailable commands:\n• 📅 Events - all events (detailed)\n• 🗓️ Calendar - weekly calendar\n• 🔄 Update - start parsing\n• 📊 Status - system status\n• ❓ Help - this help\n• ℹ️ About - bot information\n• 🌍 Language - change language",
                 'parsing_started': "🔍 Starting event parsing from VK...",
-                'parsing_completed': "✅ Parsing completed!\nSaved events: {saved_count}\nChecked groups: {groups_count}\nKeywords: {keywords_count}",
+                'parsing_in_progress': "⏳ An update is already running, you will get its result when it finishes...",
+                'last_parse_never': "none yet",
+                'stage_line': "• ⏱ {stage}: {calls} calls, {errors} errors, avg {avg} ms, p95 {p95} ms",
+                'stage_vk_api': "VK API",
+                'stage_llm_request': "YandexGPT",
+                'stage_translate': "Translation",
+                'stage_db_save': "Database writes",
+                'stage_telegram_send': "Telegram sends",
+                'last_parse_running': "running now",
+                'last_parse_ok': "{finished_at} in {duration} s, {inserted} new, {updated} updated",
+                'last_parse_failed': "{finished_at} with an error",
+                'parsing_completed': "✅ Parsing completed!\nSaved events: {saved_count}\nUpdated events: {updated_count}\nChecked groups: {groups_count}\nKeywords: {keywords_count}",
                 'no_new_events': "✅ No new events found",
                 'parsing_error': "❌ Parsing error",
                 'events_found': "🎓 Events found: {count}",
@@ -131,9 +765,11 @@ class TranslationService:
                 'searching_week': "🔍 Searching for events for the week:\n📅 {start_date} - {end_date}",
                 'choose_language': "🌍 Выберите язык / Choose language:",
                 'language_changed': "✅ Language changed to English!",
+                'prev_page': "⬅️ Back",
+                'next_page': "Next ➡️",
 
                 # Формат мероприятия
-                'event_format': "{title}\n📅 {date} at {time}\n📍 {location}\n📝 {description}\n🔗 [Post link]({url})",
+                'event_format': "{title}\n📅 {date} at {time}\n📍 {location}\n📝 {description}\n🔗 <a href=\"{url}\">Post link</a>",
 
                 # Статусы
                 'yes': '✅',
@@ -151,94 +787,249 @@ translator = TranslationService()
 
 # === УМНЫЙ ПЕРЕВОДЧИК С КЭШИРОВАНИЕМ ===
 class SmartTranslator:
-    def __init__(self):
+    """Переводчик с двухуровневым кэшем: LRU в памяти и таблица translation_cache в SQLite"""
+    LEGACY_CACHE_FILE = 'translation_cache.json'
+    PRUNE_EVERY = 20
+
+    def __init__(self, workers=TRANSLATION_WORKERS, batch_size=TRANSLATION_BATCH_SIZE,
+                 flush_interval=TRANSLATION_CACHE_FLUSH_SECONDS, memory_size=TRANSLATION_MEMORY_CACHE_SIZE,
+                 max_rows=TRANSLATION_CACHE_MAX_ROWS, ttl_days=TRANSLATION_CACHE_TTL_DAYS):
         self.translator = Translator()
-        self.translation_cache = {}
-        self.cache_file = 'translation_cache.json'
-        self.load_cache()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.ttl = ttl_days * 24 * 3600
+        # Горячие переводы в памяти: {(хеш текста, язык): перевод}
+        self.memory_cache = LRUCache(memory_size)
+        # Кэш пишется в БД пачками: новые переводы и отметки об использовании копятся до сброса
+        self.pending_writes = {}
+        self.pending_touches = set()
+        self.flushes_since_prune = 0
+        self.flush_task = None
+        self.ready = False
+        # Синхронный googletrans работает в отдельных потоках, чтобы не блокировать event loop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='translate')
+        self.semaphore = asyncio.Semaphore(workers)
         logger.info("✅ Умный переводчик с кэшированием инициализирован")
 
-    def load_cache(self):
-        """Загрузка кэша переводов из файла"""
+    @staticmethod
+    def text_hash(text):
+        """Ключ перевода: хеш исходного текста вместо самого текста"""
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    async def import_legacy_cache(self):
+        """Однократный перенос старого translation_cache.json в SQLite"""
+        self.ready = True
+        if not os.path.exists(self.LEGACY_CACHE_FILE):
+            return
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.translation_cache = json.load(f)
-                logger.info(f"✅ Загружено {len(self.translation_cache)} кэшированных переводов")
+            with open(self.LEGACY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                legacy_cache = json.load(f)
+            now = time.time()
+            rows = []
+            for cache_key, translated in legacy_cache.items():
+                text, _, target_lang = cache_key.rpartition('_')
+                if text:
+                    rows.append((self.text_hash(text), target_lang, translated, now, now))
+            async with database.transaction() as db:
+                await db.executemany('''
+                    INSERT OR IGNORE INTO translation_cache (text_hash, target_lang, translated, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+            os.replace(self.LEGACY_CACHE_FILE, f"{self.LEGACY_CACHE_FILE}.imported")
+            logger.info(f"✅ Перенесено {len(rows)} переводов из {self.LEGACY_CACHE_FILE} в базу данных")
         except Exception as e:
-            logger.warning(f"Не удалось загрузить кэш: {e}")
-            self.translation_cache = {}
-
-    def save_cache(self):
-        """Сохранение кэша переводов в файл"""
+            logger.warning(f"Не удалось перенести старый кэш переводов: {e}")
+
+    async def load_from_db(self, keys):
+        """Поиск промахов LRU в SQLite, найденное поднимается в память"""
+        found = {}
+        by_lang = {}
+        for text_hash, target_lang in keys:
+            by_lang.setdefault(target_lang, []).append(text_hash)
+        try:
+            async with database.read() as db:
+                for target_lang, hashes in by_lang.items():
+                    # Старые сборки SQLite принимают не больше 999 параметров в запросе
+                    for i in range(0, len(hashes), SQL_MAX_VARIABLES):
+                        chunk = hashes[i:i + SQL_MAX_VARIABLES]
+                        placeholders = ', '.join('?' for _ in chunk)
+                        cursor = await db.execute(f'''
+                            SELECT text_hash, translated FROM translation_cache
+                            WHERE target_lang = ? AND text_hash IN ({placeholders})
+                        ''', (target_lang, *chunk))
+                        for text_hash, translated in await cursor.fetchall():
+                            found[(text_hash, target_lang)] = translated
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать кэш переводов: {e}")
+
+        for key, translated in found.items():
+            self.memory_cache.set(key, translated)
+            self.pending_touches.add(key)
+        return found
+
+    async def flush_cache(self):
+        """Запись накопленных переводов в SQLite одной транзакцией"""
+        if not self.pending_writes and not self.pending_touches:
+            return
+        writes, self.pending_writes = self.pending_writes, {}
+        touches, self.pending_touches = self.pending_touches, set()
+        now = time.time()
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.translation_cache, f, ensure_ascii=False, indent=2)
+            async with database.transaction() as db:
+                await db.executemany('''
+                    INSERT OR REPLACE INTO translation_cache (text_hash, target_lang, translated, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(text_hash, target_lang, translated, now, now)
+                      for (text_hash, target_lang), translated in writes.items()])
+                await db.executemany(
+                    'UPDATE translation_cache SET last_access = ? WHERE text_hash = ? AND target_lang = ?',
+                    [(now, text_hash, target_lang) for text_hash, target_lang in touches - writes.keys()]
+                )
+                self.flushes_since_prune += 1
+                if self.flushes_since_prune >= self.PRUNE_EVERY:
+                    await self.prune(db)
         except Exception as e:
             logger.warning(f"Не удалось сохранить кэш: {e}")
 
+    async def prune(self, db):
+        """Удаление старых переводов и самых давно использованных сверх лимита"""
+        self.flushes_since_prune = 0
+        await db.execute('DELETE FROM translation_cache WHERE last_access < ?', (time.time() - self.ttl,))
+        await db.execute('''
+            DELETE FROM translation_cache WHERE rowid IN (
+                SELECT rowid FROM translation_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_rows,))
+
+    async def run_flusher(self):
+        """Фоновый периодический сброс кэша"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_cache()
+
+    def start(self):
+        """Запуск фонового сброса кэша"""
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.run_flusher())
+
+    async def close(self):
+        """Остановка фонового сброса и финальная запись кэша"""
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush_cache()
+        self.executor.shutdown(wait=False)
+
+    async def translate_backend(self, texts, target_lang):
+        """Перевод списка строк через googletrans вне event loop"""
+        async with self.semaphore:
+            with metrics.track('translate'):
+                if inspect.iscoroutinefunction(self.translator.translate):
+                    translated = await self.translator.translate(texts, dest=target_lang)
+                else:
+                    loop = asyncio.get_running_loop()
+                    translated = await loop.run_in_executor(
+                        self.executor, functools.partial(self.translator.translate, texts, dest=target_lang)
+                    )
+        if not isinstance(translated, list):
+            translated = [translated]
+        return [item.text if item and hasattr(item, 'text') else text for item, text in zip(translated, texts)]
+
+    async def translate_many(self, texts, target_lang: str = 'en'):
+        """Перевод пачки строк: повторы и кэш отсекаются, остальное - несколькими запросами"""
+        if target_lang == 'ru':
+            return list(texts)
+        if not self.ready:
+            await self.import_legacy_cache()
+
+        results = {}
+        db_misses = {}
+        for text in texts:
+            if not isinstance(text, str) or not text.strip() or text in results:
+                continue
+            key = (self.text_hash(text), target_lang)
+            if key in db_misses:
+                continue
+            translated = self.memory_cache.get(key)
+            if translated is not None:
+                results[text] = translated
+            else:
+                db_misses[key] = text
+
+        if db_misses:
+            found = await self.load_from_db(db_misses.keys())
+            results.update({db_misses[key]: translated for key, translated in found.items()})
+
+        missing = [text for text in db_misses.values() if text not in results]
+        metrics.inc('bot_cache_requests_total', len(results) - len(db_misses) + len(missing), cache='translation', result='memory')
+        metrics.inc('bot_cache_requests_total', len(db_misses) - len(missing), cache='translation', result='db')
+        metrics.inc('bot_cache_requests_total', len(missing), cache='translation', result='miss')
+        chunks = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        translated_chunks = await asyncio.gather(
+            *(self.translate_backend(chunk, target_lang) for chunk in chunks),
+            return_exceptions=True
+        )
+        for chunk, translated in zip(chunks, translated_chunks):
+            if isinstance(translated, Exception):
+                logger.warning(f"Ошибка перевода: {translated}")
+                # Сохраняем оригинальный текст в кэш, чтобы не пытаться переводить снова
+                translated = chunk
+            for text, result in zip(chunk, translated):
+                key = (self.text_hash(text), target_lang)
+                self.memory_cache.set(key, result)
+                self.pending_writes[key] = result
+                results[text] = result
+
+        return [results.get(text, text) if isinstance(text, str) else text for text in texts]
+
     async def translate_text(self, text: str, target_lang: str = 'en') -> str:
         """Умный перевод с кэшированием"""
-        if target_lang == 'ru' or not text.strip():
-            return text
-
-        # Создаем ключ для кэша
-        cache_key = f"{text}_{target_lang}"
-
-        # Проверяем кэш
-        if cache_key in self.translation_cache:
-            return self.translation_cache[cache_key]
-
-        try:
-            # Добавляем небольшую случайную задержку от 0.1 до 0.5 секунд
-            await asyncio.sleep(random.uniform(0.1, 0.5))
-
-            # Выполняем перевод
-            translated = self.translator.translate(text, dest=target_lang)
-
-            result = translated.text if translated and hasattr(translated, 'text') else text
-
-            # Сохраняем в кэш
-            self.translation_cache[cache_key] = result
-            self.save_cache()
-
-            return result
-
-        except Exception as e:
-            logger.warning(f"Ошибка перевода: {e}")
-            # Сохраняем оригинальный текст в кэш, чтобы не пытаться переводить снова
-            self.translation_cache[cache_key] = text
-            self.save_cache()
-            return text
+        return (await self.translate_many([text], target_lang))[0]
 
 # Инициализация умного переводчика
 text_translator = SmartTranslator()
 
 # === СИСТЕМА ЯЗЫКОВ ===
+# Языки активных пользователей в памяти: заполняется при первом обращении, пишется сквозь в БД
+user_languages = LRUCache(USER_LANGUAGE_CACHE_SIZE)
+# Значение user_settings_version, для которого собран кэш; язык могли сменить в другом процессе
+user_languages_version = None
+
 async def get_user_language(user_id: int) -> str:
-    """Получить язык пользователя из БД"""
+    """Получить язык пользователя: из кэша, при промахе - из БД"""
+    global user_languages_version
+
     try:
-        async with aiosqlite.connect('events.db') as db:
-            cursor = await db.execute(
-                'SELECT language FROM user_settings WHERE user_id = ?',
-                (user_id,)
-            )
+        async with database.read() as db:
+            cursor = await db.execute(SQL_GET_USER_SETTINGS_VERSION)
+            row = await cursor.fetchone()
+            version = row[0] if row else None
+            if version != user_languages_version:
+                user_languages.clear()
+                user_languages_version = version
+
+            language = user_languages.get(user_id)
+            if language is not None:
+                return language
+
+            cursor = await db.execute(SQL_GET_USER_LANGUAGE, (user_id,))
             result = await cursor.fetchone()
-            return result[0] if result else 'ru'
     except Exception:
         return 'ru'
 
+    language = result[0] if result else 'ru'
+    user_languages.set(user_id, language)
+    return language
+
 async def set_user_language(user_id: int, language: str):
-    """Установить язык пользователя в БД"""
+    """Установить язык пользователя в БД и в кэше"""
     try:
-        async with aiosqlite.connect('events.db') as db:
-            await db.execute(
-                '''INSERT OR REPLACE INTO user_settings (user_id, language) 
-                   VALUES (?, ?)''',
-                (user_id, language)
-            )
-            await db.commit()
+        async with database.transaction() as db:
+            await db.execute(SQL_SET_USER_LANGUAGE, (user_id, language))
+        user_languages.set(user_id, language)
     except Exception as e:
+        user_languages.pop(user_id)
         logger.error(f"Error saving language: {e}")
 
 # === КЛАВИАТУРЫ С ПОДДЕРЖКОЙ ЯЗЫКОВ ===
@@ -280,123 +1071,758 @@ def get_events_keyboard(lang: str = 'ru'):
     builder.adjust(2, 2)
     return builder.as_markup(resize_keyboard=True)
 
-# === AI АНАЛИЗАТОР С ПОДДЕРЖКОЙ ПЕРЕВОДА ===
-class YandexGPTAnalyzer:
-    def __init__(self, yandex_api_key, folder_id):
-        self.api_key = yandex_api_key
-        self.folder_id = folder_id
-        self.url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+# === КЭШ ОТВЕТОВ AI ===
+class AIResultCache:
+    """Кэш ответов модели в SQLite по хешу текста поста, версии промпта, модели и языка"""
+    EVICT_EVERY = 100
+    # Сколько попаданий копится в памяти, прежде чем last_access пишется отдельной транзакцией
+    TOUCH_FLUSH_EVERY = 100
+
+    def __init__(self, ttl_days=AI_CACHE_TTL_DAYS, max_entries=AI_CACHE_MAX_ENTRIES):
+        self.ttl = ttl_days * 24 * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes_since_evict = 0
+        # Время последнего попадания по ключу: пишется вместе со следующей записью в кэш
+        self.pending_touches = {}
 
-    async def analyze_event(self, text, target_lang='ru'):
-        if not self.api_key or not self.folder_id:
-            return None
+    @staticmethod
+    def make_key(text, prompt_version, model_uri, language):
+        """Ключ кэша: sha256 от всего, что влияет на ответ модели"""
+        raw = '\x1f'.join((prompt_version, model_uri, language, text))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
 
+    async def get(self, key):
+        """Сохраненный ответ модели или None"""
         try:
-            headers = {
-                "Authorization": f"Api-Key {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            async with database.read() as db:
+                cursor = await db.execute(
+                    'SELECT response FROM ai_cache WHERE key = ? AND created_at >= ?',
+                    (key, time.time() - self.ttl)
+                )
+                row = await cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать кэш AI: {e}")
+            row = None
+
+        if row:
+            self.hits += 1
+            metrics.inc('bot_cache_requests_total', cache='ai', result='hit')
+            # Попадание не ждет блокировку записи: last_access уйдет в базу пачкой
+            self.pending_touches[key] = time.time()
+            if len(self.pending_touches) >= self.TOUCH_FLUSH_EVERY:
+                await self.flush()
+            return row[0]
+        self.misses += 1
+        metrics.inc('bot_cache_requests_total', cache='ai', result='miss')
+        return None
+
+    async def set(self, key, response):
+        """Сохранение ответа модели, раз в EVICT_EVERY записей - чистка кэша"""
+        try:
+            now = time.time()
+            async with database.transaction() as db:
+                await self.write_touches(db)
+                await db.execute(
+                    'INSERT OR REPLACE INTO ai_cache (key, response, created_at, last_access) VALUES (?, ?, ?, ?)',
+                    (key, response, now, now)
+                )
+                self.writes_since_evict += 1
+                if self.writes_since_evict >= self.EVICT_EVERY:
+                    await self.evict(db)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить ответ AI в кэш: {e}")
+
+    async def write_touches(self, db):
+        """Накопленные last_access в открытой транзакции"""
+        touches, self.pending_touches = self.pending_touches, {}
+        await db.executemany('UPDATE ai_cache SET last_access = ? WHERE key = ?',
+                             [(last_access, key) for key, last_access in touches.items()])
+
+    async def flush(self):
+        """Запись накопленных last_access, если после попаданий не было записи в кэш"""
+        if not self.pending_touches:
+            return
+        try:
+            async with database.transaction() as db:
+                await self.write_touches(db)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить кэш AI: {e}")
 
-            # Выбираем промпт в зависимости от языка
-            if target_lang == 'en':
-                system_prompt = """You are an assistant for analyzing posts about events at MISIS University. 
-                Extract event information in JSON format.
+    async def evict(self, db):
+        """Удаление устаревших записей и самых давно использованных сверх лимита"""
+        self.writes_since_evict = 0
+        await db.execute('DELETE FROM ai_cache WHERE created_at < ?', (time.time() - self.ttl,))
+        await db.execute('''
+            DELETE FROM ai_cache WHERE key IN (
+                SELECT key FROM ai_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
 
-                Example response:
-                {
-                    "title": "AI Hackathon",
-                    "date": "11.13.2025", 
-                    "time": "14:00",
-                    "location": "Main building, room 301"
-                }"""
-            else:
-                system_prompt = """Ты — помощник для анализа постов о мероприятиях в университете МИСИС. 
-                Извлекай информацию о мероприятиях в формате JSON.
+# Общий кэш для всех анализаторов
+ai_cache = AIResultCache()
+
+# === AI АНАЛИЗАТОР ===
+class YandexGPTAnalyzer:
+    """Извлечение полей мероприятия из поста - один раз, независимо от языка пользователя"""
+    # Меняется при любой правке промпта, чтобы старые ответы не брались из кэша
+    PROMPT_VERSION = '2'
+    SYSTEM_PROMPT = """Ты — помощник для анализа постов о мероприятиях в университете МИСИС. 
+                Извлекай информацию о мероприятиях в формате JSON на языке поста.
+                Дату указывай в формате ГГГГ-ММ-ДД, время - ЧЧ:ММ.
 
                 Пример ответа:
                 {
                     "title": "Хакатон по искусственному интеллекту",
-                    "date": "13.11.2025", 
+                    "date": "2025-11-13", 
                     "time": "14:00",
                     "location": "Главный корпус, ауд. 301"
                 }"""
 
+    BATCH_SYSTEM_PROMPT = """Ты — помощник для анализа постов о мероприятиях в университете МИСИС. 
+                Тебе пришлют несколько постов, каждый начинается со строки "### id: <номер>".
+                Для каждого поста извлеки информацию о мероприятии на языке поста.
+                Дату указывай в формате ГГГГ-ММ-ДД, время - ЧЧ:ММ.
+                Ответь только JSON-массивом, по одному объекту на пост, с тем же id.
+
+                Пример ответа:
+                [
+                    {
+                        "id": 1,
+                        "title": "Хакатон по искусственному интеллекту",
+                        "date": "2025-11-13",
+                        "time": "14:00",
+                        "location": "Главный корпус, ауд. 301"
+                    }
+                ]"""
+    MAX_COMPLETION_TOKENS = 500
+    BATCH_COMPLETION_TOKENS_PER_POST = 150
+    MAX_POST_CHARS = 3000
+
+    def __init__(self, yandex_api_key, folder_id, cache=ai_cache,
+                 concurrency=AI_CONCURRENCY, tokens_per_second=AI_TOKENS_PER_SECOND):
+        self.api_key = yandex_api_key
+        self.folder_id = folder_id
+        self.url = YANDEX_GPT_URL
+        self.model_uri = f"gpt://{folder_id}/{YANDEX_GPT_MODEL}"
+        self.cache = cache
+        self.headers = {
+            "Authorization": f"Api-Key {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        # Одновременно в модель уходит не больше concurrency запросов в рамках бюджета токенов
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.token_budget = TokenBucket(tokens_per_second)
+        self.session = None
+
+    async def get_session(self):
+        """Долгоживущая сессия с пулом keep-alive соединений"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=60),
+                connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            )
+        return self.session
+
+    async def close(self):
+        """Закрытие сессии при остановке бота"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    @staticmethod
+    def estimate_tokens(payload):
+        """Грубая оценка стоимости запроса: ~3 символа на токен плюс ответ"""
+        prompt_chars = sum(len(message['text']) for message in payload['messages'])
+        return prompt_chars // 3 + payload['completionOptions']['maxTokens']
+
+    async def request_completion(self, payload):
+        """Запрос к модели с повтором и экспоненциальной задержкой при 429/5xx"""
+        tokens = self.estimate_tokens(payload)
+        for attempt in range(AI_MAX_RETRIES + 1):
+            retry_after = None
+            async with self.semaphore:
+                await self.token_budget.acquire(tokens)
+                try:
+                    with metrics.track('llm_request'):
+                        session = await self.get_session()
+                        async with session.post(self.url, headers=self.headers, json=payload) as response:
+                            if response.status == 200:
+                                result = await response.json()
+                                return result['result']['alternatives'][0]['message']['text']
+                            if response.status != 429 and response.status < 500:
+                                metrics.inc('bot_stage_errors_total', stage='llm_request')
+                                logger.warning(f"⚠️ YandexGPT ответил {response.status}")
+                                return None
+                            retry_after = response.headers.get('Retry-After')
+                            metrics.inc('bot_stage_errors_total', stage='llm_request')
+                            logger.warning(f"⚠️ YandexGPT ответил {response.status}, попытка {attempt + 1}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"⚠️ Сетевая ошибка YandexGPT, попытка {attempt + 1}: {e}")
+
+            if attempt < AI_MAX_RETRIES:
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+                else:
+                    delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                await asyncio.sleep(delay)
+        return None
+
+    async def analyze_event(self, text):
+        if not self.api_key or not self.folder_id:
+            return None
+        with metrics.track('llm_analyze'):
+            return await self._analyze_event(text)
+
+    async def _analyze_event(self, text):
+
+        # Неизмененный пост не отправляем в модель повторно
+        cache_key = self.cache.make_key(text, self.PROMPT_VERSION, self.model_uri, SOURCE_LANGUAGE)
+        cached_response = await self.cache.get(cache_key)
+        if cached_response is not None:
+            return self.parse_response(cached_response)
+        return await self._request_event(text, cache_key)
+
+    async def analyze_missed(self, text, cache_key):
+        """Анализ поста, которого уже нет в кэше: без повторного обращения к кэшу и лишнего промаха"""
+        with metrics.track('llm_analyze'):
+            return await self._request_event(text, cache_key)
+
+    async def _request_event(self, text, cache_key):
+        try:
             payload = {
-                "modelUri": f"gpt://{self.folder_id}/yandexgpt-lite",
+                "modelUri": self.model_uri,
                 "completionOptions": {
                     "stream": False,
                     "temperature": 0.3,
-                    "maxTokens": 500
+                    "maxTokens": self.MAX_COMPLETION_TOKENS
                 },
                 "messages": [
                     {
                         "role": "system",
-                        "text": system_prompt
+                        "text": self.SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
-                        "text": f"Проанализируй этот пост о мероприятии и извлеки информацию в JSON формате:\n\n{text[:3000]}"
+                        "text": f"Проанализируй этот пост о мероприятии и извлеки информацию в JSON формате:\n\n{text[:self.MAX_POST_CHARS]}"
                     }
                 ]
             }
 
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
-                async with session.post(self.url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        response_text = result['result']['alternatives'][0]['message']['text']
-
-                        cleaned_text = response_text.strip()
-                        if cleaned_text.startswith('```json'):
-                            cleaned_text = cleaned_text[7:]
-                        if cleaned_text.endswith('```'):
-                            cleaned_text = cleaned_text[:-3]
-
-                        try:
-                            ai_data = json.loads(cleaned_text)
-                            try:
-                                # Обрабатываем дату в зависимости от языка
-                                if target_lang == 'en':
-                                    event_date = datetime.strptime(ai_data.get('date', '11.01.2025'), '%m.%d.%Y')
-                                else:
-                                    event_date = datetime.strptime(ai_data.get('date', '01.11.2025'), '%d.%m.%Y')
-                                ai_data['date'] = event_date.strftime('%Y-%m-%d')
-                            except ValueError:
-                                ai_data['date'] = MIN_EVENT_DATE.strftime('%Y-%m-%d')
-
-                            if event_date >= MIN_EVENT_DATE:
-                                logger.info(f"✅ AI анализ успешен: {ai_data.get('title', 'Unknown')}")
-                                return ai_data
-                        except json.JSONDecodeError:
-                            return None
-                    return None
+            response_text = await self.request_completion(payload)
+            if response_text is None:
+                return None
+
+            # Обрезанный или не-JSON ответ не кэшируем: при следующем запуске пост снова уйдет в модель
+            ai_data = self.decode_response(response_text)
+            if ai_data is None:
+                logger.warning("⚠️ Ответ модели не разобран, в кэш не сохранен")
+                return None
+
+            await self.cache.set(cache_key, response_text)
+            return self.check_event_date(ai_data)
 
         except Exception as e:
             logger.error(f"❌ Ошибка AI анализа: {e}")
             return None
 
-# === VK ПАРСЕР С ПОДДЕРЖКОЙ ПЕРЕВОДА ===
+    async def analyze_events(self, texts):
+        """Пакетный анализ: {ключ поста: текст} -> {ключ поста: данные AI или None}
+
+        Несколько постов уходят в модель одним запросом с общим системным промптом.
+        Посты, для которых ответ не разобрался, анализируются по одному.
+        """
+        if not self.api_key or not self.folder_id:
+            return {post_key: None for post_key in texts}
+
+        results = {}
+        pending = []
+        for post_key, text in texts.items():
+            cache_key = self.cache.make_key(text, self.PROMPT_VERSION, self.model_uri, SOURCE_LANGUAGE)
+            cached_response = await self.cache.get(cache_key)
+            if cached_response is not None:
+                results[post_key] = self.parse_response(cached_response)
+            else:
+                pending.append((post_key, text, cache_key))
+
+        batches = self.split_batches(pending)
+        batch_results = await asyncio.gather(*(self.analyze_batch(batch) for batch in batches))
+        for batch_result in batch_results:
+            results.update(batch_result)
+        return results
+
+    def split_batches(self, posts):
+        """Нарезка постов на пакеты, укладывающиеся в лимит токенов"""
+        batches = []
+        batch = []
+        batch_tokens = len(self.BATCH_SYSTEM_PROMPT) // 3
+        for post in posts:
+            post_tokens = len(post[1][:self.MAX_POST_CHARS]) // 3
+            if batch and (len(batch) >= AI_BATCH_MAX_POSTS or batch_tokens + post_tokens > AI_BATCH_MAX_INPUT_TOKENS):
+                batches.append(batch)
+                batch = []
+                batch_tokens = len(self.BATCH_SYSTEM_PROMPT) // 3
+            batch.append(post)
+            batch_tokens += post_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def analyze_batch(self, batch):
+        """Один запрос на пакет постов; посты с неразобранным ответом - по одному через analyze_missed"""
+        if len(batch) == 1:
+            post_key, text, cache_key = batch[0]
+            return {post_key: await self.analyze_missed(text, cache_key)}
+
+        posts_text = '\n\n'.join(
+            f"### id: {number}\n{text[:self.MAX_POST_CHARS]}" for number, (_, text, _) in enumerate(batch, 1)
+        )
+        payload = {
+            "modelUri": self.model_uri,
+            "completionOptions": {
+                "stream": False,
+                "temperature": 0.3,
+                "maxTokens": self.BATCH_COMPLETION_TOKENS_PER_POST * len(batch)
+            },
+            "messages": [
+                {
+                    "role": "system",
+                    "text": self.BATCH_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "text": f"Проанализируй эти посты о мероприятиях и извлеки информацию в JSON формате:\n\n{posts_text}"
+                }
+            ]
+        }
+
+        try:
+            response_text = await self.request_completion(payload)
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного AI анализа: {e}")
+            response_text = None
+        if response_text is None:
+            # Запрос не прошел (лимиты, ошибка сервиса): по одному посту его тоже не повторяем,
+            # посты уйдут в резервный парсинг, а в модель попадут при следующем запуске
+            logger.warning(f"⚠️ Пакетный запрос не выполнен, {len(batch)} постов без AI анализа")
+            return {post_key: None for post_key, _, _ in batch}
+
+        try:
+            items = self.parse_batch_response(response_text)
+        except Exception as e:
+            logger.error(f"❌ Ошибка разбора пакетного ответа: {e}")
+            items = {}
+
+        results = {}
+        fallback = []
+        for number, (post_key, text, cache_key) in enumerate(batch, 1):
+            item = items.get(number)
+            if item is None:
+                fallback.append((post_key, text, cache_key))
+                continue
+            item_text = json.dumps(item, ensure_ascii=False)
+            await self.cache.set(cache_key, item_text)
+            results[post_key] = self.parse_response(item_text)
+
+        if fallback:
+            logger.info(f"🔁 Пакетный ответ не разобран для {len(fallback)} из {len(batch)} постов, анализ по одному")
+            fallback_results = await asyncio.gather(
+                *(self.analyze_missed(text, cache_key) for _, text, cache_key in fallback)
+            )
+            results.update({post_key: ai_data for (post_key, _, _), ai_data in zip(fallback, fallback_results)})
+        return results
+
+    @staticmethod
+    def parse_batch_response(response_text):
+        """Разбор JSON-массива пакетного ответа: {номер поста: объект без id}"""
+        cleaned_text = response_text.strip()
+        if cleaned_text.startswith('```json'):
+            cleaned_text = cleaned_text[7:]
+        if cleaned_text.endswith('```'):
+            cleaned_text = cleaned_text[:-3]
+
+        try:
+            data = json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(data, list):
+            return {}
+
+        items = {}
+        for item in data:
+            if not isinstance(item, dict) or 'id' not in item:
+                continue
+            try:
+                number = int(item.pop('id'))
+            except (TypeError, ValueError):
+                continue
+            if all(key in item for key in ['title', 'date', 'time', 'location']):
+                items[number] = item
+        return items
+
+    @staticmethod
+    def parse_response(response_text):
+        """Разбор ответа модели: JSON с датой в каноническом формате ГГГГ-ММ-ДД"""
+        ai_data = YandexGPTAnalyzer.decode_response(response_text)
+        if ai_data is None:
+            return None
+        return YandexGPTAnalyzer.check_event_date(ai_data)
+
+    @staticmethod
+    def decode_response(response_text):
+        """JSON-объект из ответа модели или None, если ответ не разобран"""
+        cleaned_text = response_text.strip()
+        if cleaned_text.startswith('```json'):
+            cleaned_text = cleaned_text[7:]
+        if cleaned_text.endswith('```'):
+            cleaned_text = cleaned_text[:-3]
+
+        try:
+            ai_data = json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(ai_data, dict):
+            return None
+        return ai_data
+
+    @staticmethod
+    def check_event_date(ai_data):
+        """Дата в формате ГГГГ-ММ-ДД; мероприятия раньше MIN_EVENT_DATE отбрасываются"""
+        event_date = parse_event_date(str(ai_data.get('date', '')))
+        if event_date is None:
+            event_date = MIN_EVENT_DATE
+        ai_data['date'] = event_date.strftime('%Y-%m-%d')
+
+        if event_date >= MIN_EVENT_DATE:
+            logger.info(f"✅ AI анализ успешен: {ai_data.get('title', 'Unknown')}")
+            return ai_data
+        return None
+
+# Общий анализатор: одна сессия и одна очередь запросов на весь бот
+ai_analyzer = YandexGPTAnalyzer(YANDEX_API_KEY, YANDEX_FOLDER_ID) if YANDEX_API_KEY and YANDEX_FOLDER_ID else None
+
+# === ПОИСК КЛЮЧЕВЫХ СЛОВ ===
+class KeywordMatcher:
+    """Все ключевые слова одним регулярным выражением: текст поста просматривается один раз"""
+    def __init__(self, keywords, lemmas=KEYWORD_LEMMAS):
+        # Вариант написания -> исходные ключевые слова
+        self.variants = {}
+        for keyword in keywords:
+            self.variants.setdefault(keyword.lower(), []).append(keyword)
+        if lemmas:
+            self.add_word_forms()
+
+        # Ключевые слова, начинающиеся с другого варианта, находятся в той же позиции текста
+        self.prefixes = {
+            variant: [other for other in self.variants if other != variant and variant.startswith(other)]
+            for variant in self.variants
+        }
+
+        # Просмотр вперед находит вхождения во всех позициях, включая пересекающиеся;
+        # варианты собраны в префиксное дерево, чтобы в каждой позиции не перебирать их все
+        trie = {}
+        for variant in self.variants:
+            node = trie
+            for char in variant:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self.pattern = re.compile('(?=(' + self.trie_pattern(trie) + '))') if self.variants else None
+
+    @staticmethod
+    def trie_pattern(node):
+        """Регулярное выражение для поддерева; более длинные варианты пробуются первыми"""
+        alternatives = [re.escape(char) + KeywordMatcher.trie_pattern(child)
+                        for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        pattern = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def for_keywords(keywords):
+        """Один матчер на набор ключевых слов (кортеж)"""
+        return KeywordMatcher(keywords)
+
+    def add_word_forms(self):
+        """Словоформы ключевых слов, которых нет в словаре подстрок"""
+        try:
+            import pymorphy3
+        except ImportError:
+            logger.warning("⚠️ pymorphy3 не установлен, словоформы ключевых слов не добавлены")
+            return
+
+        morph = pymorphy3.MorphAnalyzer()
+        for variant, keywords in list(self.variants.items()):
+            if not morph.word_is_known(variant):
+                continue
+            for parse in morph.parse(variant):
+                for form in parse.lexeme:
+                    word = form.word
+                    # Формы, уже содержащие ключевое слово, и так найдутся
+                    if variant not in word:
+                        self.variants.setdefault(word, []).extend(keywords)
+
+    def find(self, text):
+        """Множество исходных ключевых слов, встречающихся в тексте"""
+        if not text or self.pattern is None:
+            return set()
+
+        found = set()
+        for match in self.pattern.finditer(text.lower()):
+            variant = match.group(1)
+            found.update(self.variants[variant])
+            for prefix in self.prefixes[variant]:
+                found.update(self.variants[prefix])
+        return found
+
+# === ЛОКАЛЬНЫЙ РАЗБОР ПОСТОВ (NATASHA) ===
+class LocalEventExtractor:
+    """Дата, время и место без LLM: Natasha для дат и адресов, регулярные выражения для времени
+
+    Пост считается разобранным, только если в нем ровно одна будущая дата, есть
+    время и место. Все остальное уходит в YandexGPT.
+    """
+    def __init__(self, min_date=MIN_EVENT_DATE):
+        self.min_date = min_date
+        self.dates_extractor = None
+        self.addr_extractor = None
+        self.available = True
+        # Модели Natasha не рассчитаны на параллельные вызовы - один поток на все посты
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='natasha')
+
+    def load(self):
+        """Словари и модели загружаются один раз, при первом разборе"""
+        if self.dates_extractor is not None or not self.available:
+            return self.available
+        try:
+            from natasha import MorphVocab, DatesExtractor, AddrExtractor
+        except ImportError:
+            logger.warning("⚠️ natasha не установлена, локальный разбор постов отключен")
+            self.available = False
+            return False
+
+        morph_vocab = MorphVocab()
+        self.dates_extractor = DatesExtractor(morph_vocab)
+        self.addr_extractor = AddrExtractor(morph_vocab)
+        logger.info("✅ Модели Natasha загружены")
+        return True
+
+    def extract(self, text, now=None):
+        """{'date', 'time', 'location'} или None, если пост лучше отдать модели"""
+        if not self.load():
+            return None
+        now = now or datetime.now()
+        lowered = text.lower()
+
+        dates = set()
+        for match in self.dates_extractor(text):
+            fact = match.fact
+            if not (fact.month and fact.day):
+                continue
+            year = fact.year or fallback_extractor.infer_year(fact.month, fact.day, now)
+            date = fallback_extractor.valid_date(year, fact.month, fact.day, self.min_date)
+            if date:
+                dates.add(date)
+        # Несколько дат (регистрация до..., само событие...) - пусть разбирается модель
+        if len(dates) != 1:
+            return None
+
+        time = fallback_extractor.find_explicit_time(lowered)
+        if not time:
+            return None
+
+        location = fallback_extractor.find_explicit_location(text, lowered)
+        if not location:
+            addresses = list(self.addr_extractor(text))
+            if addresses:
+                location = fallback_extractor.line_at(text, text, addresses[0].start)
+        if not location:
+            return None
+
+        return {'date': dates.pop(), 'time': time, 'location': location}
+
+    async def extract_many(self, texts):
+        """Разбор пачки постов в отдельном потоке, чтобы не блокировать event loop"""
+        if not texts or not self.available:
+            return [None] * len(texts)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: [self.extract(text) for text in texts])
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+local_extractor = LocalEventExtractor() if LOCAL_EXTRACTION else None
+
+# === ПОИСК ПОВТОРНЫХ ПОСТОВ ===
+class FingerprintIndex:
+    """Отпечатки недавних постов: один анонс из нескольких групп разбирается один раз
+
+    Ключ поста - его адрес, у репоста - адрес оригинала из copy_history. Кроме точного
+    ключа сравниваются 64-битные SimHash текстов: отпечатки, различающиеся не больше чем
+    на max_distance бит, считаются одним анонсом, если у постов совпадают дата и время
+    (анонсы по одному шаблону различаются почти только ими). Для поиска отпечаток делится
+    на max_distance + 1 полос - у близких отпечатков хотя бы одна полоса совпадает целиком.
+    """
+    BITS = 64
+    TOKEN_RE = re.compile(r'\w+')
+    URL_RE = re.compile(r'https?://\S+|vk\.(?:com|cc)/\S+')
+
+    def __init__(self, max_distance=DEDUP_MAX_DISTANCE, min_tokens=DEDUP_MIN_TOKENS, window_days=DEDUP_WINDOW_DAYS):
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.window = window_days * 24 * 3600
+        band_count = max_distance + 1
+        width = self.BITS // band_count
+        # (сдвиг, маска) полос; последняя забирает оставшиеся биты
+        self.bands = [
+            (index * width, (1 << (width if index < band_count - 1 else self.BITS - index * width)) - 1)
+            for index in range(band_count)
+        ]
+        # {ключ поста: (отпечаток, дата и время, адрес сохраненной записи)}
+        self.posts = {}
+        # {(номер полосы, значение): [ключ поста]}
+        self.buckets = {}
+        # Новые отпечатки, которые запишутся вместе со следующей пачкой мероприятий
+        self.pending = []
+
+    @classmethod
+    def tokens(cls, text):
+        """Слова текста без ссылок, в нижнем регистре"""
+        return cls.TOKEN_RE.findall(cls.URL_RE.sub(' ', text.lower()))
+
+    def simhash(self, text):
+        """SimHash по словам и парам слов; для коротких текстов None - сравниваются только ключи"""
+        tokens = self.tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        hashes = []
+        for feature in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            hashes.append(format(int.from_bytes(digest, 'big'), '064b'))
+        # Бит отпечатка - 1, если он стоит в большинстве хешей; zip считает столбцы без цикла по битам
+        return int(''.join('1' if column.count('1') * 2 > len(hashes) else '0' for column in zip(*hashes)), 2)
+
+    @staticmethod
+    def event_key(text):
+        """Дата и время анонса по резервному парсеру"""
+        date = fallback_extractor.extract_date(text, MIN_EVENT_DATE)
+        return f"{date} {fallback_extractor.find_explicit_time(text.lower()) or ''}".strip()
+
+    @staticmethod
+    def distance(first, second):
+        return bin(first ^ second).count('1')
+
+    def add(self, key, fingerprint, event_key, canonical_url):
+        self.posts[key] = (fingerprint, event_key, canonical_url)
+        if fingerprint is not None:
+            for band, (shift, mask) in enumerate(self.bands):
+                self.buckets.setdefault((band, (fingerprint >> shift) & mask), []).append(key)
+
+    def find(self, key, fingerprint, event_key):
+        """Адрес записи, которую повторяет пост, или None"""
+        if key in self.posts:
+            return self.posts[key][2]
+        if fingerprint is None:
+            return None
+        for band, (shift, mask) in enumerate(self.bands):
+            for other_key in self.buckets.get((band, (fingerprint >> shift) & mask), ()):
+                other_fingerprint, other_event_key, canonical_url = self.posts[other_key]
+                if other_event_key == event_key and self.distance(fingerprint, other_fingerprint) <= self.max_distance:
+                    return canonical_url
+        return None
+
+    def check(self, key, text, source_url):
+        """Адрес уже разобранной записи, если пост ее повторяет; иначе пост запоминается"""
+        fingerprint = self.simhash(text)
+        event_key = self.event_key(text) if fingerprint is not None else None
+        canonical_url = self.find(key, fingerprint, event_key)
+        # Повторный разбор того же поста (например, для нового языка) повтором не считается
+        if canonical_url is not None and canonical_url != source_url:
+            return canonical_url
+        if canonical_url is None:
+            self.add(key, fingerprint, event_key, source_url)
+            # SQLite хранит знаковые 64-битные числа
+            stored = fingerprint - (1 << self.BITS) if fingerprint is not None and fingerprint >> (self.BITS - 1) else fingerprint
+            self.pending.append((key, stored, event_key, source_url, time.time()))
+        return None
+
+    async def load(self):
+        """Индекс из отпечатков за последние window секунд"""
+        self.posts = {}
+        self.buckets = {}
+        self.pending = []
+        async with database.read() as db:
+            cursor = await db.execute(
+                'SELECT post_key, fingerprint, event_key, canonical_url FROM post_fingerprints WHERE created_at >= ?',
+                (time.time() - self.window,)
+            )
+            for key, fingerprint, event_key, canonical_url in await cursor.fetchall():
+                if fingerprint is not None:
+                    fingerprint &= (1 << self.BITS) - 1
+                self.add(key, fingerprint, event_key, canonical_url)
+        logger.info(f"🧬 Загружено отпечатков постов: {len(self.posts)}")
+
+    async def flush(self, db):
+        """Запись новых отпечатков и удаление старых в открытой транзакции"""
+        pending, self.pending = self.pending, []
+        await db.executemany(
+            '''INSERT OR REPLACE INTO post_fingerprints (post_key, fingerprint, event_key, canonical_url, created_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            pending
+        )
+        await db.execute('DELETE FROM post_fingerprints WHERE created_at < ?', (time.time() - self.window,))
+
+fingerprint_index = FingerprintIndex() if DEDUP_ENABLED else None
+
+# === VK ПАРСЕР ===
 class VKParser:
-    def __init__(self, vk_api, yandex_api_key=None, folder_id=None):
+    def __init__(self, vk_api, yandex_api_key=None, folder_id=None, vk_client=None, batch_mode=VK_BATCH_MODE,
+                 ai_analyzer=None, ai_batch_mode=AI_BATCH_MODE, local_extractor=None, fingerprints=None):
         self.vk = vk_api
-        self.ai_analyzer = None
-
-        if yandex_api_key and folder_id:
+        self.vk_client = vk_client or AsyncVKClient(sync_api=vk_api)
+        self.batch_mode = batch_mode
+        self.ai_batch_mode = ai_batch_mode
+        # Водяные знаки, которые будут записаны вместе с мероприятиями: {группа: (id, дата)}
+        self.pending_watermarks = {}
+        self.ai_analyzer = ai_analyzer
+        self.local_extractor = local_extractor
+        # Индекс отпечатков для пропуска повторов в потоковом парсинге
+        self.fingerprints = fingerprints
+        # Сколько постов разобрал каждый уровень: Natasha, YandexGPT, резервный парсинг
+        self.tier_counts = {'local': 0, 'ai': 0, 'fallback': 0}
+
+        if self.ai_analyzer is None and yandex_api_key and folder_id:
             self.ai_analyzer = YandexGPTAnalyzer(yandex_api_key, folder_id)
+        if self.ai_analyzer:
             logger.info("✅ AI анализатор активирован")
 
-    async def search_events(self, group_ids, keywords, target_lang='ru'):
-        """Поиск мероприятий с поддержкой языка"""
+    async def search_events(self, group_ids, keywords, languages=SUPPORTED_LANGUAGES):
+        """Поиск мероприятий: каждый пост разбирается один раз, без привязки к языку"""
         try:
             events = []
-
-            for group_id in group_ids:
-                try:
-                    logger.info(f"🔍 Парсинг группы VK: {group_id}")
-                    group_events = await self.get_group_events(group_id, keywords, target_lang)
-                    events.extend(group_events)
-                except Exception as e:
-                    logger.warning(f"Ошибка в группе {group_id}: {e}")
+            watermarks = await self.load_watermarks(group_ids, languages)
+            self.pending_watermarks = {}
+
+            # Стены всех групп забираем пачками через execute
+            walls = {}
+            if self.batch_mode == 'execute' and len(group_ids) > 1:
+                walls = await self.fetch_walls_batched(group_ids)
+
+            # Группы обрабатываются параллельно, ограничения на частоту держит vk_client
+            results = await asyncio.gather(
+                *(self.get_group_events(group_id, keywords, walls.get(group_id), watermarks.get(group_id))
+                  for group_id in group_ids),
+                return_exceptions=True
+            )
+            for group_id, group_events in zip(group_ids, results):
+                if isinstance(group_events, Exception):
+                    logger.warning(f"Ошибка в группе {group_id}: {group_events}")
+                    continue
+                events.extend(group_events)
 
             # Фильтруем по дате
             filtered_events = []
@@ -415,63 +1841,245 @@ class VKParser:
             logger.error(f"❌ Ошибка парсинга VK: {e}")
             return []
 
-    async def get_group_events(self, group_id, keywords, target_lang='ru'):
+    async def get_group_events(self, group_id, keywords, response=None, watermark=None):
         """Получение мероприятий из конкретной группы VK"""
-        events = []
-        try:
-            owner_id = f"-{group_id}" if group_id.isdigit() else group_id
+        with metrics.track('vk_group'):
+            try:
+                posts = await self.fetch_group_posts(group_id, response, watermark)
+
+                matcher = KeywordMatcher.for_keywords(tuple(keywords))
+                matched_posts = [post for post in posts if self.match_post(matcher, post, group_id)]
+
+                parsed = await self.extract_events([(group_id, post) for post in matched_posts])
+                events = [event_data for event_data in parsed if event_data]
+                metrics.inc('bot_posts_total', len(parsed), stage='matched')
+                metrics.inc('bot_posts_total', len(events), stage='extracted')
+
+                # Водяной знак сдвигаем только после успешного разбора, иначе посты группы потеряются
+                if posts:
+                    self.pending_watermarks[group_id] = self.newest_watermark(posts)
+                return events
+
+            except Exception as e:
+                logger.error(f"❌ Ошибка парсинга группы {group_id}: {e}")
+                metrics.inc('bot_stage_errors_total', stage='vk_group')
+                return []
 
-            response = self.vk.wall.get(
-                owner_id=owner_id,
-                count=100,
-                filter='owner'
+    async def fetch_group_posts(self, group_id, response=None, watermark=None):
+        """Новые посты группы; стена, не пришедшая в пакетном запросе, запрашивается отдельно"""
+        if response is None or isinstance(response, Exception):
+            logger.info(f"🔍 Парсинг группы VK: {group_id}")
+            response = await self.fetch_wall(group_id)
+
+        posts = await self.collect_new_posts(group_id, response, watermark)
+        logger.info(f"📬 Новых постов в группе {group_id}: {len(posts)}")
+        metrics.inc('bot_posts_total', len(posts), stage='new')
+        return posts
+
+    @staticmethod
+    def newest_watermark(posts):
+        """Водяной знак группы после разбора постов: (id, дата) самого нового"""
+        newest = max(posts, key=lambda post: post['id'])
+        return newest['id'], newest.get('date')
+
+    @staticmethod
+    def post_identity(post):
+        """(ключ для поиска повторов, текст для отпечатка, адрес поста); у репоста ключ - адрес оригинала"""
+        source_url = vk_post_url(post['owner_id'], post['id'])
+        text = post.get('text') or ''
+        copy_history = post.get('copy_history')
+        if copy_history:
+            original = copy_history[0]
+            return vk_post_url(original['owner_id'], original['id']), f"{text}\n{original.get('text', '')}", source_url
+        return source_url, text, source_url
+
+    @staticmethod
+    def match_post(matcher, post, group_id):
+        """Есть ли в посте ключевые слова"""
+        if not post.get('text'):
+            return False
+        matched_keywords = matcher.find(post['text'])
+        if matched_keywords:
+            logger.info(f"🎯 Найден пост с ключевыми словами {sorted(matched_keywords)} в группе {group_id}")
+        return bool(matched_keywords)
+
+    async def extract_events(self, posts):
+        """Разбор постов [(группа, пост)] в мероприятия того же порядка; None - пост отброшен
+
+        Шаблонные анонсы разбираются локально, в модель уходят только сомнительные посты.
+        """
+        events = [None] * len(posts)
+        pending = list(range(len(posts)))
+
+        if self.local_extractor:
+            local_results = await self.local_extractor.extract_many([posts[index][1]['text'] for index in pending])
+            remaining = []
+            for index, local_data in zip(pending, local_results):
+                group_id, post = posts[index]
+                if local_data:
+                    local_data = {'title': self.extract_title(post['text']), **local_data}
+                    events[index] = self.build_event(post, group_id, post['owner_id'], local_data, tier='local')
+                else:
+                    remaining.append(index)
+            pending = remaining
+
+        if self.ai_analyzer and self.ai_batch_mode:
+            # Все посты уходят в модель пакетами; ключ - позиция, id постов разных групп совпадают
+            ai_results = await self.ai_analyzer.analyze_events({index: posts[index][1]['text'] for index in pending})
+            for index in pending:
+                group_id, post = posts[index]
+                events[index] = self.build_event(post, group_id, post['owner_id'], ai_results.get(index))
+        else:
+            # Посты разбираются параллельно, нагрузку на модель ограничивает анализатор
+            parsed = await asyncio.gather(
+                *(self.parse_post(posts[index][1], posts[index][0], posts[index][1]['owner_id']) for index in pending)
             )
+            for index, event_data in zip(pending, parsed):
+                events[index] = event_data
 
-            for post in response['items']:
-                if not post.get('text'):
-                    continue
+        return events
 
-                text = post['text']
-                text_lower = text.lower()
-                if any(keyword.lower() in text_lower for keyword in keywords):
-                    logger.info(f"🎯 Найден пост с ключевым словом в группе {group_id}")
-                    event_data = await self.parse_post(post, group_id, post['owner_id'], target_lang)
-                    if event_data:
-                        events.append(event_data)
+    @staticmethod
+    def wall_params(group_id):
+        """Параметры wall.get для числового id или короткого имени группы"""
+        if group_id.isdigit():
+            return {'owner_id': -int(group_id)}
+        return {'domain': group_id}
+
+    async def collect_new_posts(self, group_id, first_page, last_post_id=None):
+        """Посты новее водяного знака; стена листается через offset, пока не дойдем до него"""
+        if last_post_id is None:
+            # Первый запуск для группы - как раньше, только последняя страница
+            return list(first_page.get('items', []))
+
+        new_posts = {}
+        page = first_page
+        offset = 0
+        for _ in range(VK_MAX_PAGES):
+            items = page.get('items', [])
+            reached_watermark = False
+            for post in items:
+                if post['id'] > last_post_id:
+                    new_posts[post['id']] = post
+                elif not post.get('is_pinned'):
+                    # Закрепленный пост может быть старым, по нему границу не определяем
+                    reached_watermark = True
+
+            offset += len(items)
+            if reached_watermark or not items or offset >= page.get('count', 0):
+                break
+            page = await self.fetch_wall(group_id, offset=offset)
+        else:
+            logger.warning(f"⚠️ В группе {group_id} больше {VK_MAX_PAGES} страниц новых постов, остальные пропущены")
 
-            return events
+        return list(new_posts.values())
 
+    async def load_watermarks(self, group_ids, languages=SUPPORTED_LANGUAGES):
+        """Последние обработанные посты групп: {группа: id поста}
+
+        Берется самый отстающий из языков - если для какого-то языка знака нет,
+        группа разбирается заново, чтобы этот язык получил все мероприятия.
+        """
+        try:
+            async with database.read() as db:
+                group_placeholders = ', '.join('?' for _ in group_ids)
+                language_placeholders = ', '.join('?' for _ in languages)
+                cursor = await db.execute(f'''
+                    SELECT group_id, MIN(last_post_id), COUNT(DISTINCT language) FROM vk_watermarks
+                    WHERE group_id IN ({group_placeholders}) AND language IN ({language_placeholders})
+                    GROUP BY group_id
+                ''', (*group_ids, *languages))
+                rows = await cursor.fetchall()
+                return {group_id: last_post_id for group_id, last_post_id, count in rows if count == len(languages)}
         except Exception as e:
-            logger.error(f"❌ Ошибка парсинга группы {group_id}: {e}")
-            return []
+            logger.warning(f"Не удалось загрузить водяные знаки: {e}")
+            return {}
+
+    async def fetch_wall(self, group_id, count=VK_PAGE_SIZE, offset=0):
+        """Один вызов wall.get для группы"""
+        return await self.vk_client.call(
+            'wall.get',
+            **self.wall_params(group_id),
+            count=count,
+            offset=offset,
+            filter='owner'
+        )
 
-    async def parse_post(self, post, group_id, owner_id, target_lang='ru'):
-        """Парсинг поста VK с умным переводом"""
+    async def fetch_walls_batched(self, group_ids, count=VK_PAGE_SIZE):
+        """Загрузка стен пачками через execute: до 25 вызовов wall.get за один запрос"""
+        chunks = [group_ids[i:i + VK_EXECUTE_BATCH_SIZE] for i in range(0, len(group_ids), VK_EXECUTE_BATCH_SIZE)]
+        results = await asyncio.gather(
+            *(self.execute_wall_chunk(chunk, count) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        walls = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Пакетный запрос не удался ({len(chunk)} групп): {result}")
+                walls.update({group_id: result for group_id in chunk})
+            else:
+                walls.update(result)
+
+        logger.info(f"📦 Загружено стен через execute: {len(walls)} групп за {len(chunks)} запросов")
+        return walls
+
+    async def execute_wall_chunk(self, group_ids, count=VK_PAGE_SIZE):
+        """Один запрос execute для группы стен, ответ раскладывается по группам"""
+        calls = []
+        for group_id in group_ids:
+            params = {**self.wall_params(group_id), 'count': count, 'filter': 'owner'}
+            calls.append(f"API.wall.get({json.dumps(params, ensure_ascii=False)})")
+        code = f"return [{', '.join(calls)}];"
+
+        response = await self.vk_client.call('execute', code=code)
+
+        # Упавший внутри execute вызов возвращается как false - ошибка касается только своей группы
+        walls = {}
+        for group_id, wall in zip(group_ids, response or []):
+            if isinstance(wall, dict) and 'items' in wall:
+                walls[group_id] = wall
+            else:
+                walls[group_id] = VKApiError(None, f"execute не вернул стену группы {group_id}")
+        return walls
+
+    async def parse_post(self, post, group_id, owner_id):
+        """Разбор поста VK в запись мероприятия на языке оригинала"""
+        # AI анализ
+        ai_data = None
+        if self.ai_analyzer:
+            ai_data = await self.ai_analyzer.analyze_event(post['text'])
+        return self.build_event(post, group_id, owner_id, ai_data)
+
+    def build_event(self, post, group_id, owner_id, ai_data=None, tier='ai'):
+        """Запись мероприятия из поста и ответа AI (или Natasha), без ответа - резервный парсинг"""
         try:
             text = post['text']
             post_id = post['id']
 
-            # AI анализ
-            ai_data = None
-            if self.ai_analyzer:
-                ai_data = await self.ai_analyzer.analyze_event(text, target_lang)
-
             if ai_data and all(key in ai_data for key in ['title', 'date', 'time', 'location']):
                 title = ai_data.get('title')
                 date = ai_data.get('date')
                 time = ai_data.get('time')
                 location = ai_data.get('location')
-                logger.info(f"🎯 AI анализ: {title}")
+                if tier == 'local':
+                    logger.info(f"🧩 Локальный разбор: {title}")
+                else:
+                    logger.info(f"🎯 AI анализ: {title}")
             else:
+                tier = 'fallback'
                 # Резервный парсинг
                 title = self.extract_title(text)
-                date = self.extract_date(text)
-                time = self.extract_time(text)
-                location = self.extract_location(text)
+                date, time, location = fallback_extractor.extract(text, MIN_EVENT_DATE)
                 logger.info(f"ℹ️ Ручной парсинг: {title}")
 
             if not title:
-                title = "Мероприятие МИСИС" if target_lang == 'ru' else "MISIS Event"
+                title = "Мероприятие МИСИС"
+            # Пустые поля из ответа AI добираем резервным парсингом - время участвует в сортировке
+            if not time:
+                time = fallback_extractor.extract_time(text)
+            if not location:
+                location = fallback_extractor.extract_location(text)
 
             # Проверяем дату
             try:
@@ -482,32 +2090,11 @@ class VKParser:
                 date = MIN_EVENT_DATE.strftime('%Y-%m-%d')
 
             # Формируем ссылку
-            if str(owner_id).startswith('-'):
-                group_num = str(owner_id)[1:]
-                source_url = f"https://vk.com/wall-{group_num}_{post_id}"
-            else:
-                source_url = f"https://vk.com/wall{owner_id}_{post_id}"
+            source_url = vk_post_url(owner_id, post_id)
 
             # Очищаем описание
             cleaned_description = clean_description(text, title)
 
-            # УМНЫЙ ПЕРЕВОД: переводим только если нужно и используем кэш
-            if target_lang == 'en':
-                # Создаем задачи для параллельного перевода
-                translate_tasks = [
-                    text_translator.translate_text(title, 'en'),
-                    text_translator.translate_text(cleaned_description, 'en'),
-                    text_translator.translate_text(location, 'en')
-                ]
-
-                # Выполняем все переводы параллельно
-                translated_texts = await asyncio.gather(*translate_tasks, return_exceptions=True)
-
-                # Обрабатываем результаты
-                title = translated_texts[0] if not isinstance(translated_texts[0], Exception) else title
-                cleaned_description = translated_texts[1] if not isinstance(translated_texts[1], Exception) else cleaned_description
-                location = translated_texts[2] if not isinstance(translated_texts[2], Exception) else location
-
             event_data = {
                 'title': title,
                 'description': cleaned_description,
@@ -516,17 +2103,42 @@ class VKParser:
                 'location': location,
                 'source': f"vk_{group_id}",
                 'source_url': source_url,
-                'tags': '#event' if target_lang == 'en' else '#мероприятие',
                 'image_path': None,
-                'ai_processed': ai_data is not None
+                'ai_processed': tier == 'ai'
             }
 
+            self.tier_counts[tier] += 1
+            metrics.inc('bot_posts_extracted_total', tier=tier)
             return event_data
 
         except Exception as e:
             logger.error(f"❌ Ошибка парсинга поста: {e}")
             return None
 
+    async def localize_events(self, events, language):
+        """Версия мероприятий для языка: переводятся только название, описание и место"""
+        if language == SOURCE_LANGUAGE:
+            return [{**event, 'tags': EVENT_TAGS[language]} for event in events]
+
+        # УМНЫЙ ПЕРЕВОД: все поля всех мероприятий одной пачкой, с кэшем
+        fields = ('title', 'description', 'location')
+        texts = [event[field] for event in events for field in fields]
+        try:
+            translated = await text_translator.translate_many(texts, language)
+        except Exception as e:
+            logger.warning(f"Ошибка перевода мероприятий: {e}")
+            translated = texts
+
+        localized = []
+        for index, event in enumerate(events):
+            values = translated[index * len(fields):(index + 1) * len(fields)]
+            localized.append({**event, **dict(zip(fields, values)), 'tags': EVENT_TAGS.get(language, '#event')})
+        return localized
+
+    async def parse_and_save(self, group_ids, keywords, languages=SUPPORTED_LANGUAGES):
+        """Полный цикл потоком: мероприятия сохраняются пачками, пока остальные посты еще разбираются"""
+        return await IngestPipeline(self, languages).run(group_ids, keywords)
+
     def extract_title(self, text):
         """Извлечение заголовка"""
         lines = text.split('\n')
@@ -540,128 +2152,312 @@ class VKParser:
         words = text.split()[:8]
         return ' '.join(words) + '...'
 
-    def extract_date(self, text):
-        """Извлечение даты"""
-        date_patterns = [
-            r'(\d{1,2}\.\d{1,2}\.\d{4})',
-            r'(\d{1,2}\.\d{1,2})(?!\.\d)',
-            r'(\d{1,2}\s+(?:январ[ья]|феврал[ья]|март[а]?|апрел[ья]|ма[йя]|июн[ья]|июл[ья]|август[ья]|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья])\s+\d{4})',
-            r'(\d{1,2}\s+(?:январ[ья]|феврал[ья]|март[а]?|апрел[ья]|ма[йя]|июн[ья]|июл[ья]|август[ья]|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья]))',
-        ]
+    async def save_events_to_db(self, events, language='ru'):
+        """Пакетное сохранение одной транзакцией: возвращает (добавлено, обновлено)
 
-        month_mapping = {
-            'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4,
-            'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'август': 8,
-            'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12
-        }
+        Новые посты добавляются, у уже сохраненных обновляются изменившиеся поля
+        (отредактированный текст, перенесенная дата), неизменные не трогаются.
+        """
+        with metrics.track('db_save'):
+            try:
+                async with database.transaction() as db:
+                    inserted, updated, unchanged = await self.write_events(db, events, language)
+                    # Водяные знаки пишем в той же транзакции, чтобы не потерять посты при сбое
+                    await self.write_watermarks(db, self.pending_watermarks, [language])
 
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                date_str = match if isinstance(match, str) else match[0]
-                try:
-                    if re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', date_str):
-                        day, month, year = map(int, date_str.split('.'))
-                        date_obj = datetime(year, month, day)
-                        if date_obj >= MIN_EVENT_DATE:
-                            return date_obj.strftime('%Y-%m-%d')
-                    elif re.match(r'\d{1,2}\.\d{1,2}(?!\.\d)', date_str):
-                        day, month = map(int, date_str.split('.'))
-                        current_year = datetime.now().year
-                        if month < datetime.now().month or (month == datetime.now().month and day < datetime.now().day):
-                            current_year += 1
-                        date_obj = datetime(current_year, month, day)
-                        if date_obj >= MIN_EVENT_DATE:
-                            return date_obj.strftime('%Y-%m-%d')
-                    elif any(month in date_str.lower() for month in month_mapping.keys()):
-                        for month_name, month_num in month_mapping.items():
-                            if month_name in date_str.lower():
-                                numbers = re.findall(r'\d+', date_str)
-                                if numbers:
-                                    day = int(numbers[0])
-                                    year_match = re.search(r'\d{4}', date_str)
-                                    year = int(year_match.group()) if year_match else datetime.now().year
-                                    date_obj = datetime(year, month_num, day)
-                                    if date_obj >= MIN_EVENT_DATE:
-                                        return date_obj.strftime('%Y-%m-%d')
-                except Exception:
-                    continue
+                self.record_saved(language, inserted, updated, unchanged)
+                return inserted, updated
 
-        return MIN_EVENT_DATE.strftime('%Y-%m-%d')
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения в БД: {e}")
+                metrics.inc('bot_stage_errors_total', stage='db_save')
+                return 0, 0
 
-    def extract_time(self, text):
-        """Извлечение времени"""
-        time_patterns = [
-            r'(\d{1,2}:\d{2})',
-            r'(\d{1,2}\s*[чh]\s*\d{1,2})',
+    @staticmethod
+    async def write_events(db, events, language):
+        """Вставка и обновление мероприятий в открытой транзакции: (добавлено, обновлено, без изменений)"""
+        # Внутри пакета один пост встречается один раз - побеждает последняя версия
+        rows = {event['source_url']: tuple(event.get(field) for field in EVENT_FIELDS) for event in events}
+        source_urls = list(rows)
+
+        existing = {}
+        for i in range(0, len(source_urls), SQL_MAX_VARIABLES):
+            chunk = source_urls[i:i + SQL_MAX_VARIABLES]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor = await db.execute(f'''
+                SELECT source_url, {', '.join(EVENT_FIELDS)} FROM events
+                WHERE language = ? AND source_url IN ({placeholders})
+            ''', (language, *chunk))
+            for row in await cursor.fetchall():
+                existing[row[0]] = tuple(row[1:])
+
+        inserted = [url for url in source_urls if url not in existing]
+        updated = [url for url in source_urls if url in existing and existing[url] != rows[url]]
+
+        await db.executemany(
+            SQL_UPSERT_EVENT,
+            [(*rows[url], url, language) for url in inserted + updated]
+        )
+        return len(inserted), len(updated), len(source_urls) - len(inserted) - len(updated)
+
+    @staticmethod
+    async def write_watermarks(db, watermarks, languages):
+        """Водяные знаки {группа: (id, дата)} для всех языков в открытой транзакции"""
+        await db.executemany('''
+            INSERT OR REPLACE INTO vk_watermarks (group_id, language, last_post_id, last_post_date, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [(group_id, language, post_id, post_date)
+              for group_id, (post_id, post_date) in watermarks.items() for language in languages])
+
+    @staticmethod
+    def record_saved(language, inserted, updated, unchanged):
+        """Сброс кэша страниц, метрики и лог после сохранения"""
+        if inserted or updated:
+            EventPages.invalidate()
+        metrics.inc('bot_events_saved_total', inserted, language=language, result='inserted')
+        metrics.inc('bot_events_saved_total', updated, language=language, result='updated')
+        logger.info(f"💾 Сохранено ({language}): добавлено {inserted}, обновлено {updated}, без изменений {unchanged}")
+
+# === ПОТОКОВЫЙ КОНВЕЙЕР ПАРСИНГА ===
+class IngestPipeline:
+    """Один запуск парсинга: загрузка -> фильтр -> разбор -> перевод -> сохранение
+
+    Этапы связаны ограниченными очередями: если модель или база не успевают, загрузка
+    стен ждет, и в памяти находится не больше нескольких очередей постов. Мероприятия
+    сохраняются пачками по ходу запуска. Водяной знак группы записывается в той же
+    транзакции, что и последний ее пост, - после сбоя группа разбирается заново.
+    """
+    def __init__(self, parser, languages=SUPPORTED_LANGUAGES, queue_size=INGEST_QUEUE_SIZE):
+        self.parser = parser
+        self.languages = languages
+        self.queue_size = queue_size
+        self.matcher = None
+        # Сколько постов группы еще в конвейере и какой водяной знак она получит
+        self.pending = {}
+        self.watermarks = {}
+        # Группы с потерянными из-за ошибки постами знак не получают
+        self.failed = set()
+        # Группы, все посты которых отсеяны или сохранены, - знак пишется со следующей пачкой
+        self.ready = set()
+        self.saved = {language: [0, 0] for language in languages}
+        self.fingerprints = parser.fingerprints
+        self.duplicates = 0
+
+    async def run(self, group_ids, keywords):
+        """Запуск всех этапов; возвращает {язык: (добавлено, обновлено)}"""
+        self.matcher = KeywordMatcher.for_keywords(tuple(keywords))
+        watermarks = await self.parser.load_watermarks(group_ids, self.languages)
+        if self.fingerprints:
+            await self.fingerprints.load()
+
+        # Первые страницы всех стен пачками через execute, дальше группы листаются по одной
+        walls = {}
+        if self.parser.batch_mode == 'execute' and len(group_ids) > 1:
+            walls = await self.parser.fetch_walls_batched(group_ids)
+
+        posts, matched, unique, extracted, localized = (asyncio.Queue(self.queue_size) for _ in range(5))
+        groups = deque(group_ids)
+        stages = [
+            self.fetch_stage(groups, walls, watermarks, posts),
+            self.stage('filter', posts, matched, self.filter_posts, INGEST_FILTER_WORKERS, INGEST_EXTRACT_BATCH),
+        ]
+        if self.fingerprints:
+            # Индекс общий для всех групп - один воркер, повторы отсеиваются до модели и перевода
+            stages.append(self.stage('dedup', matched, unique, self.skip_duplicates, 1, INGEST_EXTRACT_BATCH))
+        else:
+            unique = matched
+        stages += [
+            self.stage('extract', unique, extracted, self.extract_events, INGEST_EXTRACT_WORKERS, INGEST_EXTRACT_BATCH),
+            self.stage('translate', extracted, localized, self.localize_events,
+                       INGEST_TRANSLATE_WORKERS, INGEST_TRANSLATE_BATCH),
+            # База пишется из одного соединения - один воркер, большие пачки
+            self.stage('persist', localized, None, self.persist, 1, INGEST_PERSIST_BATCH, INGEST_PERSIST_INTERVAL),
         ]
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Знаки групп, в которых не нашлось ни одного мероприятия, и отпечатки отсеянных постов
+        if self.ready or (self.fingerprints and self.fingerprints.pending):
+            await self.persist([])
 
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for time_str in matches:
+        logger.info(f"✅ Потоковый парсинг {len(group_ids)} групп завершен: {self.saved}, повторов пропущено: {self.duplicates}")
+        return {language: tuple(counts) for language, counts in self.saved.items()}
+
+    @staticmethod
+    async def take(queue, size, linger=0):
+        """Пачка до size элементов: первый ждем, следующие - сколько уже есть или до linger секунд
+
+        Возвращает (пачка, конец потока). None в очереди - конец, он возвращается
+        в очередь, чтобы его увидели остальные воркеры этапа.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < size:
+            if not batch:
+                item = await queue.get()
+                deadline = time.monotonic() + linger
+            elif not queue.empty():
+                item = queue.get_nowait()
+            elif deadline > time.monotonic():
                 try:
-                    if ':' in time_str:
-                        hours, minutes = time_str.split(':')
-                        return f"{int(hours):02d}:{int(minutes):02d}"
-                    elif any(char in time_str.lower() for char in ['ч', 'h']):
-                        time_str = re.sub(r'[чhмm\s]', ' ', time_str).strip()
-                        parts = time_str.split()
-                        if len(parts) == 2:
-                            hours, minutes = parts
-                            return f"{int(hours):02d}:{int(minutes):02d}"
-                except Exception:
+                    item = await asyncio.wait_for(queue.get(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+            else:
+                break
+            if item is None:
+                queue.put_nowait(None)
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def stage(self, name, source, target, handler, workers, batch_size, linger=0):
+        """Воркеры этапа: пачка из source -> handler -> элементы в target (put ждет, если target полон)"""
+        async def worker():
+            finished = False
+            while not finished:
+                batch, finished = await self.take(source, batch_size, linger)
+                if not batch:
+                    continue
+                try:
+                    with metrics.track(f"ingest_{name}"):
+                        results = await handler(batch)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка этапа {name} ({len(batch)} постов): {e}")
+                    for group_id, _ in batch:
+                        self.done(group_id, failed=True)
+                    continue
+                for item in results:
+                    await target.put(item)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+        if target is not None:
+            await target.put(None)
+
+    async def fetch_stage(self, groups, walls, watermarks, target):
+        """Загрузка новых постов групп; знак группы известен сразу, записывается позже"""
+        async def worker():
+            while groups:
+                group_id = groups.popleft()
+                try:
+                    with metrics.track('vk_group'):
+                        posts = await self.parser.fetch_group_posts(
+                            group_id, walls.pop(group_id, None), watermarks.get(group_id)
+                        )
+                except Exception as e:
+                    logger.error(f"❌ Ошибка парсинга группы {group_id}: {e}")
+                    continue
+                if not posts:
                     continue
 
-        return "18:00"
-
-    def extract_location(self, text):
-        """Извлечение места"""
-        location_keywords = [
-            'ауд.', 'аудитория', 'корпус', 'МИСИС', 'лаборатория', 'зал',
-            'комната', 'кабинет', 'актовый', 'конференц', 'лекторий', 'актовый зал'
-        ]
+                self.pending[group_id] = len(posts)
+                self.watermarks[group_id] = self.parser.newest_watermark(posts)
+                for post in posts:
+                    await target.put((group_id, post))
+
+        await asyncio.gather(*(worker() for _ in range(max(1, INGEST_FETCH_WORKERS))))
+        await target.put(None)
+
+    def done(self, group_id, failed=False):
+        """Пост группы покинул конвейер: сохранен, отсеян или потерян из-за ошибки"""
+        if failed:
+            self.failed.add(group_id)
+        self.pending[group_id] -= 1
+        if self.pending[group_id] == 0 and group_id not in self.failed:
+            self.ready.add(group_id)
+
+    async def filter_posts(self, batch):
+        matched = []
+        for group_id, post in batch:
+            if self.parser.match_post(self.matcher, post, group_id):
+                matched.append((group_id, post))
+            else:
+                self.done(group_id)
+        metrics.inc('bot_posts_total', len(matched), stage='matched')
+        return matched
+
+    async def skip_duplicates(self, batch):
+        """Репосты и почти одинаковые анонсы не разбираются: запись уже есть или в пути"""
+        unique = []
+        for group_id, post in batch:
+            key, text, source_url = self.parser.post_identity(post)
+            canonical_url = self.fingerprints.check(key, text, source_url)
+            if canonical_url:
+                logger.info(f"♻️ Пост {source_url} повторяет {canonical_url}, пропускаем")
+                self.duplicates += 1
+                self.done(group_id)
+            else:
+                unique.append((group_id, post))
+        metrics.inc('bot_posts_total', len(batch) - len(unique), stage='duplicate')
+        return unique
+
+    async def extract_events(self, batch):
+        events = await self.parser.extract_events(batch)
+        results = []
+        for (group_id, _), event_data in zip(batch, events):
+            if event_data:
+                results.append((group_id, event_data))
+            else:
+                self.done(group_id)
+        metrics.inc('bot_posts_total', len(results), stage='extracted')
+        return results
+
+    async def localize_events(self, batch):
+        """Версии пачки мероприятий для всех языков: [(группа, {язык: мероприятие})]"""
+        events = [event_data for _, event_data in batch]
+        localized = {language: await self.parser.localize_events(events, language) for language in self.languages}
+        return [(group_id, {language: localized[language][index] for language in self.languages})
+                for index, (group_id, _) in enumerate(batch)]
+
+    async def persist(self, batch):
+        """Пачка мероприятий всех языков и водяные знаки завершенных групп одной транзакцией"""
+        with metrics.track('db_save'):
+            counts = Counter(group_id for group_id, _ in batch)
+            # Группы, у которых после этой пачки в конвейере не останется постов
+            completed = {group_id for group_id, count in counts.items()
+                         if self.pending[group_id] == count and group_id not in self.failed} | self.ready
+            results = {}
+            async with database.transaction() as db:
+                for language in self.languages:
+                    results[language] = await self.parser.write_events(
+                        db, [versions[language] for _, versions in batch], language
+                    )
+                await self.parser.write_watermarks(
+                    db, {group_id: self.watermarks[group_id] for group_id in completed}, self.languages
+                )
+                if self.fingerprints:
+                    await self.fingerprints.flush(db)
+
+        for language, (inserted, updated, unchanged) in results.items():
+            if batch:
+                self.parser.record_saved(language, inserted, updated, unchanged)
+            self.saved[language][0] += inserted
+            self.saved[language][1] += updated
+        for group_id, _ in batch:
+            self.done(group_id)
+        self.ready -= completed
+        return []
 
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if any(keyword in line.lower() for keyword in location_keywords):
-                return line
+# === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
+EVENT_TAGS = {'ru': '#мероприятие', 'en': '#event'}
 
-        return "МИСИС"
+def vk_post_url(owner_id, post_id):
+    """Ссылка на пост VK: у сообществ owner_id отрицательный - wall-123_45"""
+    return f"https://vk.com/wall{owner_id}_{post_id}"
 
-    async def save_events_to_db(self, events, language='ru'):
-        """Сохранение в базу данных с указанием языка"""
+def parse_event_date(value):
+    """Дата из ответа модели: канонический ГГГГ-ММ-ДД или привычный ДД.ММ.ГГГГ"""
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y'):
         try:
-            saved_count = 0
-            async with aiosqlite.connect('events.db') as db:
-                for event in events:
-                    # Теперь проверяем по source и языку
-                    cursor = await db.execute(
-                        'SELECT id FROM events WHERE source = ? AND event_date = ? AND language = ?',
-                        (event['source'], event['event_date'], language)
-                    )
-                    existing = await cursor.fetchone()
-
-                    if not existing:
-                        await db.execute('''
-                            INSERT INTO events (title, description, event_date, event_time, location, source, source_url, tags, image_path, language)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            event['title'], event['description'], event['event_date'],
-                            event['event_time'], event['location'], event['source'],
-                            event['source_url'], event['tags'], event.get('image_path'), language
-                        ))
-                        saved_count += 1
-                        logger.info(f"💾 Сохранено ({language}): {event['title']}")
-
-                await db.commit()
-                return saved_count
+            return datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+    return None
 
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения в БД: {e}")
-            return 0
-
-# === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 def remove_title_from_description(title, description):
     """Удаляет заголовок из начала описания"""
     if not title or not description:
@@ -712,7 +2508,7 @@ def clean_description(text, title):
 # === БАЗА ДАННЫХ С НАСТРОЙКАМИ ПОЛЬЗОВАТЕЛЕЙ ===
 async def init_db():
     """Инициализация базы данных с таблицей настроек"""
-    async with aiosqlite.connect('events.db') as db:
+    async with database.transaction() as db:
         # Таблица мероприятий
         await db.execute('''
             CREATE TABLE IF NOT EXISTS events (
@@ -731,6 +2527,64 @@ async def init_db():
             )
         ''')
 
+        # Последние обработанные посты по группам
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS vk_watermarks (
+                group_id TEXT NOT NULL,
+                language TEXT NOT NULL DEFAULT 'ru',
+                last_post_id INTEGER NOT NULL,
+                last_post_date INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (group_id, language)
+            )
+        ''')
+
+        # Кэш ответов AI
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+
+        # Кэш переводов
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                text_hash TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                translated TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (text_hash, target_lang)
+            )
+        ''')
+
+        # Отпечатки недавних постов для поиска повторов между группами
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS post_fingerprints (
+                post_key TEXT PRIMARY KEY,
+                fingerprint INTEGER,
+                event_key TEXT,
+                canonical_url TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+        # История запусков парсинга для /status
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS parse_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trigger TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT
+            )
+        ''')
+
         # Таблица настроек пользователей
         await db.execute('''
             CREATE TABLE IF NOT EXISTS user_settings (
@@ -740,22 +2594,114 @@ async def init_db():
             )
         ''')
 
-        await db.commit()
-        logger.info("✅ База данных готова")
+    logger.info("✅ База данных готова")
+
+async def migrate_add_language(db):
+    """Поле language в таблице events"""
+    cursor = await db.execute("PRAGMA table_info(events)")
+    columns = await cursor.fetchall()
+    column_names = [column[1] for column in columns]
+
+    if 'language' not in column_names:
+        logger.info("🔄 Добавляем поле language в таблицу events...")
+        await db.execute('ALTER TABLE events ADD COLUMN language TEXT NOT NULL DEFAULT "ru"')
+
+async def migrate_events_indexes(db):
+    """Индексы для выборок по языку и дате и уникальный ключ поста (source_url + language)"""
+    # Перед уникальным индексом убираем накопившиеся дубликаты, оставляя последнюю запись
+    cursor = await db.execute('''
+        DELETE FROM events
+        WHERE source_url IS NOT NULL AND id NOT IN (
+            SELECT MAX(id) FROM events WHERE source_url IS NOT NULL GROUP BY source_url, language
+        )
+    ''')
+    if cursor.rowcount > 0:
+        logger.info(f"🧹 Удалено дубликатов мероприятий: {cursor.rowcount}")
+
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_events_language_date_time
+        ON events (language, event_date, event_time)
+    ''')
+    await db.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_events_source_url_language
+        ON events (source_url, language)
+    ''')
+
+async def migrate_fill_event_time(db):
+    """Пустое время вместо NULL: по (event_date, event_time, id) листаются страницы"""
+    await db.execute("UPDATE events SET event_time = '' WHERE event_time IS NULL")
+
+async def migrate_events_version(db):
+    """Счетчик изменений мероприятий: по нему все процессы бота сбрасывают кэш страниц"""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS events_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    await db.execute('INSERT OR IGNORE INTO events_version (id, version) VALUES (1, 0)')
+    for operation in ('INSERT', 'UPDATE', 'DELETE'):
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS events_version_{operation.lower()} AFTER {operation} ON events
+            BEGIN
+                UPDATE events_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+async def migrate_parse_lease(db):
+    """Аренда парсинга: ручной и плановый запуск идет в одном процессе из всех"""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS parse_lease (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+async def migrate_user_settings_version(db):
+    """Счетчик изменений настроек пользователей: по нему процессы сбрасывают кэш языков"""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS user_settings_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    await db.execute('INSERT OR IGNORE INTO user_settings_version (id, version) VALUES (1, 0)')
+    for operation in ('INSERT', 'UPDATE', 'DELETE'):
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_settings_version_{operation.lower()} AFTER {operation} ON user_settings
+            BEGIN
+                UPDATE user_settings_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+# Миграции по порядку: (версия схемы, функция)
+MIGRATIONS = [
+    (1, migrate_add_language),
+    (2, migrate_events_indexes),
+    (3, migrate_fill_event_time),
+    (4, migrate_events_version),
+    (5, migrate_parse_lease),
+    (6, migrate_user_settings_version),
+]
 
 async def migrate_db():
-    """Миграция базы данных для добавления поля language"""
+    """Миграция базы данных до последней версии схемы (PRAGMA user_version)"""
     try:
-        async with aiosqlite.connect('events.db') as db:
-            # Проверяем, есть ли столбец language
-            cursor = await db.execute("PRAGMA table_info(events)")
-            columns = await cursor.fetchall()
-            column_names = [column[1] for column in columns]
-
-            if 'language' not in column_names:
-                logger.info("🔄 Добавляем поле language в таблицу events...")
-                await db.execute('ALTER TABLE events ADD COLUMN language TEXT NOT NULL DEFAULT "ru"')
-                await db.commit()
+        async with database.transaction() as db:
+            cursor = await db.execute("PRAGMA user_version")
+            version = (await cursor.fetchone())[0]
+
+            applied = 0
+            for target_version, migration in MIGRATIONS:
+                if version < target_version:
+                    logger.info(f"🔄 Миграция БД до версии {target_version}: {migration.__doc__}")
+                    await migration(db)
+                    await db.execute(f"PRAGMA user_version = {target_version}")
+                    version = target_version
+                    applied += 1
+
+            if applied:
                 logger.info("✅ Миграция базы данных завершена")
             else:
                 logger.info("✅ База данных уже актуальна")
@@ -786,6 +2732,136 @@ class Calendar:
         builder.adjust(2)
         return builder.as_markup()
 
+# === ПОСТРАНИЧНЫЙ ВЫВОД МЕРОПРИЯТИЙ ===
+class EventPages:
+    """Страницы мероприятий: EVENTS_PAGE_SIZE штук в сообщении, кнопки назад/далее"""
+    ALL = 'all'
+    CALLBACK_PREFIX = 'page'
+
+    # Карточки по (id, язык), страницы по (scope, язык, направление, курсор), счетчики по (scope, язык)
+    cards = LRUCache(RENDER_CACHE_SIZE)
+    pages = LRUCache(PAGE_CACHE_SIZE)
+    counts = LRUCache(PAGE_CACHE_SIZE)
+    # Номер поколения: результат, прочитанный до сброса кэша, в кэш уже не попадет
+    generation = 0
+    # Значение events_version, для которого собраны кэши; базу меняют и другие процессы
+    version = None
+
+    @staticmethod
+    def invalidate():
+        """Сброс кэшей после изменения мероприятий в базе"""
+        EventPages.generation += 1
+        EventPages.cards.clear()
+        EventPages.pages.clear()
+        EventPages.counts.clear()
+
+    @staticmethod
+    async def sync():
+        """Сброс кэшей, если мероприятия изменил другой процесс (или прямой запрос к базе)"""
+        async with database.read() as db:
+            cursor = await db.execute('SELECT version FROM events_version WHERE id = 1')
+            row = await cursor.fetchone()
+        version = row[0] if row else None
+        if version != EventPages.version:
+            EventPages.invalidate()
+            EventPages.version = version
+
+    @staticmethod
+    def scope_bounds(scope):
+        """Диапазон дат: все мероприятия или неделя, начиная с даты scope"""
+        if scope == EventPages.ALL:
+            return MIN_EVENT_DATE.strftime('%Y-%m-%d'), '9999-12-31'
+        start_date = datetime.strptime(scope, '%Y-%m-%d')
+        return scope, (start_date + timedelta(days=6)).strftime('%Y-%m-%d')
+
+    @staticmethod
+    async def count(lang, scope):
+        await EventPages.sync()
+        key = (scope, lang)
+        count = EventPages.counts.get(key)
+        if count is not None:
+            return count
+
+        generation = EventPages.generation
+        date_from, date_to = EventPages.scope_bounds(scope)
+        async with database.read() as db:
+            cursor = await db.execute(SQL_COUNT_EVENTS, (lang, date_from, date_to))
+            count = (await cursor.fetchone())[0]
+        if generation == EventPages.generation:
+            EventPages.counts.set(key, count)
+        return count
+
+    @staticmethod
+    async def fetch(lang, scope, direction='next', cursor_id=None):
+        """Строки страницы и признаки наличия предыдущей/следующей страницы"""
+        date_from, date_to = EventPages.scope_bounds(scope)
+        limit = EVENTS_PAGE_SIZE + 1
+
+        async with database.read() as db:
+            if cursor_id is not None:
+                cursor = await db.execute(SQL_EVENT_CURSOR, (cursor_id, lang))
+                key = await cursor.fetchone()
+                rows = []
+                if key is not None:
+                    # Вторая граница диапазона дат следует из курсора: он сам внутри диапазона
+                    if direction == 'next':
+                        cursor = await db.execute(SQL_EVENTS_PAGE_AFTER, (lang, date_to, *key, limit))
+                    else:
+                        cursor = await db.execute(SQL_EVENTS_PAGE_BEFORE, (lang, date_from, *key, limit))
+                    rows = await cursor.fetchall()
+                if rows:
+                    has_more = len(rows) > EVENTS_PAGE_SIZE
+                    rows = rows[:EVENTS_PAGE_SIZE]
+                    if direction == 'next':
+                        return rows, True, has_more
+                    return rows[::-1], has_more, True
+
+            # Первая страница, а также если мероприятие-курсор пропало из базы
+            cursor = await db.execute(SQL_EVENTS_FIRST_PAGE, (lang, date_from, date_to, limit))
+            rows = await cursor.fetchall()
+            return rows[:EVENTS_PAGE_SIZE], False, len(rows) > EVENTS_PAGE_SIZE
+
+    @staticmethod
+    def keyboard(lang, scope, rows, has_prev, has_next):
+        builder = InlineKeyboardBuilder()
+        prefix = EventPages.CALLBACK_PREFIX
+        if has_prev:
+            builder.button(text=translator.get_text('prev_page', lang), callback_data=f"{prefix}|{scope}|prev|{rows[0][0]}")
+        if has_next:
+            builder.button(text=translator.get_text('next_page', lang), callback_data=f"{prefix}|{scope}|next|{rows[-1][0]}")
+        return builder.as_markup() if has_prev or has_next else None
+
+    @staticmethod
+    def card(row, lang, generation):
+        """Карточка мероприятия из кэша по (id, язык)"""
+        key = (row[0], lang)
+        text = EventPages.cards.get(key)
+        if text is None:
+            text = format_event(row[1:], lang)
+            if generation == EventPages.generation:
+                EventPages.cards.set(key, text)
+        return text
+
+    @staticmethod
+    async def render(lang, scope, direction='next', cursor_id=None):
+        """Текст страницы и клавиатура; (None, None), если мероприятий нет"""
+        await EventPages.sync()
+        key = (scope, lang, direction, cursor_id)
+        page = EventPages.pages.get(key)
+        if page is not None:
+            return page
+
+        generation = EventPages.generation
+        rows, has_prev, has_next = await EventPages.fetch(lang, scope, direction, cursor_id)
+        if rows:
+            text = '\n\n'.join(EventPages.card(row, lang, generation) for row in rows)
+            page = text, EventPages.keyboard(lang, scope, rows, has_prev, has_next)
+        else:
+            page = None, None
+        if generation == EventPages.generation:
+            EventPages.pages.set(key, page)
+        return page
+
 # === ОБРАБОТЧИКИ КОМАНД ===
 @dp.message(Command("start"))
 async def start_handler(message: Message):
@@ -794,7 +2870,7 @@ async def start_handler(message: Message):
 
     # Всегда показываем выбор языка при старте
     welcome_text = translator.get_text('choose_language', 'ru')
-    await message.answer(welcome_text, reply_markup=get_language_keyboard())
+    message_queue.send_message(message.chat.id, welcome_text, reply_markup=get_language_keyboard())
 
 @dp.callback_query(F.data.startswith("lang_"))
 async def language_callback_handler(callback: CallbackQuery):
@@ -806,18 +2882,18 @@ async def language_callback_handler(callback: CallbackQuery):
 
     # Показываем сообщение об успешной смене языка
     lang_text = translator.get_text('language_changed', lang)
-    await callback.message.edit_text(lang_text)
+    message_queue.edit_message_text(callback.message.chat.id, callback.message.message_id, lang_text)
 
     # Показываем основное меню
     welcome_text = translator.get_text('welcome', lang)
-    await callback.message.answer(welcome_text, reply_markup=get_main_keyboard(lang))
+    message_queue.send_message(callback.message.chat.id, welcome_text, reply_markup=get_main_keyboard(lang))
     await callback.answer()
 
 @dp.message(F.text == "🌍 Язык")
 @dp.message(F.text == "🌍 Language")
 async def language_button_handler(message: Message):
     """Обработчик кнопки смены языка"""
-    await message.answer(
+    message_queue.send_message(message.chat.id,
         translator.get_text('choose_language', await get_user_language(message.from_user.id)),
         reply_markup=get_language_keyboard()
     )
@@ -829,7 +2905,7 @@ async def main_menu_handler(message: Message):
     """Обработчик кнопки главного меню"""
     user_id = message.from_user.id
     lang = await get_user_language(user_id)
-    await message.answer(
+    message_queue.send_message(message.chat.id,
         translator.get_text('choose_action', lang),
         reply_markup=get_main_keyboard(lang)
     )
@@ -840,7 +2916,7 @@ async def events_button_handler(message: Message):
     """Обработчик кнопки мероприятий"""
     user_id = message.from_user.id
     lang = await get_user_language(user_id)
-    await message.answer(
+    message_queue.send_message(message.chat.id,
         translator.get_text('events_section', lang),
         reply_markup=get_events_keyboard(lang)
     )
@@ -877,11 +2953,31 @@ async def about_handler(message: Message):
     user_id = message.from_user.id
     lang = await get_user_language(user_id)
     about_text = translator.get_text('about_text', lang)
-    await message.answer(about_text)
+    message_queue.send_message(message.chat.id, about_text)
 
 # === ОСНОВНЫЕ ОБРАБОТЧИКИ С ПОДДЕРЖКОЙ ЯЗЫКА ===
-async def send_event_message(chat_id, event_data, lang='ru'):
-    """Отправка сообщения с мероприятием с учетом языка"""
+# Карточки страницы вместе с разделителями укладываются в одно сообщение
+EVENT_CARD_LIMIT = (TELEGRAM_MESSAGE_LIMIT - 2 * (EVENTS_PAGE_SIZE - 1)) // EVENTS_PAGE_SIZE
+
+def escape_html(text, limit):
+    """Текст, экранированный для parse_mode=HTML, не длиннее limit символов (с многоточием при обрезке)"""
+    escaped = html.escape(text, quote=False)
+    if len(escaped) <= limit:
+        return escaped
+    if limit <= 1:
+        return ''
+    pieces = []
+    length = 1
+    for char in text:
+        piece = html.escape(char, quote=False)
+        if length + len(piece) > limit:
+            break
+        pieces.append(piece)
+        length += len(piece)
+    return ''.join(pieces).rstrip() + '…'
+
+def format_event(event_data, lang='ru', limit=EVENT_CARD_LIMIT):
+    """HTML-карточка мероприятия с учетом языка, не длиннее limit символов"""
     title, description, event_date, event_time, location, image_path, source_url = event_data
 
     # Форматируем дату в зависимости от языка
@@ -890,17 +2986,24 @@ async def send_event_message(chat_id, event_data, lang='ru'):
     else:
         formatted_date = datetime.strptime(event_date, '%Y-%m-%d').strftime('%d.%m.%Y')
 
-    # Формируем текст мероприятия
-    event_text = translator.get_text('event_format', lang).format(
-        title=title,
-        date=formatted_date,
-        time=event_time,
-        location=location,
-        description=description,
-        url=source_url
-    )
-
-    await bot.send_message(chat_id=chat_id, text=event_text, parse_mode='Markdown')
+    # Поля из VK и модели экранируются: один «<» или «&» не должен ломать всю страницу
+    fields = {
+        'title': escape_html(title or '', 200),
+        'date': formatted_date,
+        'time': escape_html(event_time or '', 20),
+        'location': escape_html(location or '', 200),
+        'url': html.escape(source_url or '')
+    }
+    template = translator.get_text('event_format', lang)
+    # Описание занимает все, что осталось от лимита карточки
+    budget = limit - len(template.format(description='', **fields))
+    return template.format(description=escape_html(description or '', budget), **fields)
+
+async def send_events_page(chat_id, lang, scope):
+    """Постановка первой страницы мероприятий в очередь отправки"""
+    text, keyboard = await EventPages.render(lang, scope)
+    if text:
+        message_queue.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
 
 @dp.message(Command("status"))
 async def status_handler(message: Message):
@@ -908,13 +3011,30 @@ async def status_handler(message: Message):
     user_id = message.from_user.id
     lang = await get_user_language(user_id)
 
+    last_parse = await parse_scheduler.describe_last_run(lang)
+    tier_counts = parse_scheduler.parser.tier_counts
+    stage_lines = []
+    for stage in ('vk_api', 'llm_request', 'translate', 'db_save', 'telegram_send'):
+        summary = metrics.stage_summary(stage)
+        if summary:
+            calls, errors, avg, p95 = summary
+            stage_lines.append(translator.get_text('stage_line', lang,
+                                                   stage=translator.get_text(f'stage_{stage}', lang),
+                                                   calls=calls, errors=errors, avg=round(avg), p95=round(p95)))
     status_text = translator.get_text('status_text', lang,
                                       bot_status=translator.get_text('yes', lang),
                                       vk_status=translator.get_text('yes', lang),
                                       ai_status=translator.get_text('yes', lang) if YANDEX_API_KEY and YANDEX_FOLDER_ID else translator.get_text('no', lang),
-                                      db_status=translator.get_text('yes', lang) if os.path.exists('events.db') else translator.get_text('no', lang)
+                                      ai_cache_hits=ai_cache.hits,
+                                      ai_cache_misses=ai_cache.misses,
+                                      local_tier=tier_counts['local'],
+                                      ai_tier=tier_counts['ai'],
+                                      fallback_tier=tier_counts['fallback'],
+                                      db_status=translator.get_text('yes', lang) if os.path.exists(DB_PATH) else translator.get_text('no', lang),
+                                      last_parse=last_parse,
+                                      stages=''.join(f"{line}\n" for line in stage_lines)
                                       )
-    await message.answer(status_text)
+    message_queue.send_message(message.chat.id, status_text)
 
 @dp.message(Command("help"))
 async def help_handler(message: Message):
@@ -930,7 +3050,7 @@ async def help_handler(message: Message):
                                     groups=groups_text,
                                     keywords=keywords_text
                                     )
-    await message.answer(help_text)
+    message_queue.send_message(message.chat.id, help_text)
 
 @dp.message(Command("events"))
 async def events_handler(message: Message):
@@ -939,27 +3059,18 @@ async def events_handler(message: Message):
     lang = await get_user_language(user_id)
 
     try:
-        async with aiosqlite.connect('events.db') as db:
-            cursor = await db.execute('''
-                SELECT title, description, event_date, event_time, location, image_path, source_url
-                FROM events 
-                WHERE event_date >= ? AND language = ?
-                ORDER BY event_date, event_time
-            ''', (MIN_EVENT_DATE.strftime('%Y-%m-%d'), lang))
-            events = await cursor.fetchall()
-
-        if events:
-            await message.answer(translator.get_text('events_found', lang, count=len(events)))
+        count = await EventPages.count(lang, EventPages.ALL)
 
-            for event_data in events:
-                await send_event_message(message.chat.id, event_data, lang)
+        if count:
+            message_queue.send_message(message.chat.id, translator.get_text('events_found', lang, count=count))
+            await send_events_page(message.chat.id, lang, EventPages.ALL)
 
         else:
-            await message.answer(translator.get_text('no_events', lang))
+            message_queue.send_message(message.chat.id, translator.get_text('no_events', lang))
 
     except Exception as e:
         logger.error(f"Ошибка: {e}")
-        await message.answer(translator.get_text('loading_error', lang))
+        message_queue.send_message(message.chat.id, translator.get_text('loading_error', lang))
 
 @dp.message(Command("calendar"))
 async def calendar_handler(message: Message):
@@ -968,7 +3079,7 @@ async def calendar_handler(message: Message):
     lang = await get_user_language(user_id)
 
     keyboard = Calendar.generate_week_keyboard(lang)
-    await message.answer(
+    message_queue.send_message(message.chat.id,
         translator.get_text('calendar_choose', lang),
         reply_markup=keyboard
     )
@@ -992,36 +3103,27 @@ async def week_handler(callback: CallbackQuery):
             start_date_str = start_date.strftime('%d.%m.%Y')
             end_date_str = end_date.strftime('%d.%m.%Y')
 
-        await callback.message.edit_text(
+        message_queue.edit_message_text(callback.message.chat.id, callback.message.message_id,
             translator.get_text('searching_week', lang,
                                 start_date=start_date_str,
                                 end_date=end_date_str
                                 )
         )
 
-        async with aiosqlite.connect('events.db') as db:
-            cursor = await db.execute('''
-                SELECT title, description, event_date, event_time, location, image_path, source_url
-                FROM events 
-                WHERE event_date BETWEEN ? AND ? AND language = ?
-                ORDER BY event_date, event_time
-            ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), lang))
-            events = await cursor.fetchall()
-
-        if events:
-            await callback.message.answer(
+        count = await EventPages.count(lang, date_str)
+
+        if count:
+            message_queue.send_message(callback.message.chat.id,
                 translator.get_text('week_events', lang,
                                     start_date=start_date_str,
                                     end_date=end_date_str,
-                                    count=len(events)
+                                    count=count
                                     )
             )
-
-            for event_data in events:
-                await send_event_message(callback.message.chat.id, event_data, lang)
+            await send_events_page(callback.message.chat.id, lang, date_str)
 
         else:
-            await callback.message.answer(
+            message_queue.send_message(callback.message.chat.id,
                 translator.get_text('no_week_events', lang,
                                     start_date=start_date_str,
                                     end_date=end_date_str
@@ -1032,72 +3134,296 @@ async def week_handler(callback: CallbackQuery):
 
     except Exception as e:
         logger.error(f"Ошибка в week_handler: {e}")
-        await callback.message.answer(translator.get_text('loading_error', lang))
+        message_queue.send_message(callback.message.chat.id, translator.get_text('loading_error', lang))
         await callback.answer()
 
+@dp.callback_query(F.data.startswith(f"{EventPages.CALLBACK_PREFIX}|"))
+async def events_page_handler(callback: CallbackQuery):
+    """Листание страниц мероприятий: сообщение редактируется на месте"""
+    lang = await get_user_language(callback.from_user.id)
+
+    try:
+        _, scope, direction, cursor_id = callback.data.split("|")
+        text, keyboard = await EventPages.render(lang, scope, direction, int(cursor_id))
+        if text:
+            message_queue.edit_message_text(callback.message.chat.id, callback.message.message_id, text, parse_mode='HTML', reply_markup=keyboard)
+        else:
+            message_queue.edit_message_text(callback.message.chat.id, callback.message.message_id, translator.get_text('no_events', lang))
+    except Exception as e:
+        logger.error(f"Ошибка в events_page_handler: {e}")
+    await callback.answer()
+
 @dp.message(Command("update"))
 async def update_handler(message: Message):
-    """Запуск парсинга на языке пользователя"""
+    """Запуск парсинга: мероприятия сохраняются сразу на всех языках"""
     user_id = message.from_user.id
     lang = await get_user_language(user_id)
 
-    try:
-        await message.answer(translator.get_text('parsing_started', lang))
+    # Если обновление уже идет, присоединяемся к нему, а не запускаем второе
+    status_key = 'parsing_in_progress' if await parse_scheduler.busy() else 'parsing_started'
+    message_queue.send_message(message.chat.id, translator.get_text(status_key, lang))
 
-        parser = VKParser(
-            vk,
-            yandex_api_key=YANDEX_API_KEY,
-            folder_id=YANDEX_FOLDER_ID
-        )
+    # Парсинг идет в фоне: обработчик не занимает воркер вебхука на все время работы VK и AI
+    parse_scheduler.spawn(report_manual_parse(message.chat.id, lang))
 
-        # Парсим на языке пользователя
-        events = await parser.search_events(VK_GROUP_IDS, VK_EVENT_KEYWORDS, lang)
-        saved_count = await parser.save_events_to_db(events, lang)
+async def report_manual_parse(chat_id, lang):
+    """Ожидание ручного парсинга и отчет пользователю о результате"""
+    try:
+        saved = await parse_scheduler.run('manual')
+        saved_count, updated_count = saved.get(lang, (0, 0))
 
-        if saved_count > 0:
-            await message.answer(
+        if saved_count > 0 or updated_count > 0:
+            message_queue.send_message(chat_id,
                 translator.get_text('parsing_completed', lang,
                                     saved_count=saved_count,
+                                    updated_count=updated_count,
                                     groups_count=len(VK_GROUP_IDS),
                                     keywords_count=len(VK_EVENT_KEYWORDS)
                                     )
             )
         else:
-            await message.answer(translator.get_text('no_new_events', lang))
+            message_queue.send_message(chat_id, translator.get_text('no_new_events', lang))
 
     except Exception as e:
         logger.error(f"Ошибка парсинга: {e}")
-        await message.answer(translator.get_text('parsing_error', lang))
+        message_queue.send_message(chat_id, translator.get_text('parsing_error', lang))
+
+# === ПЛАНИРОВЩИК ПАРСИНГА ===
+class ParseScheduler:
+    """Периодический парсинг: один общий VKParser и не больше одного запуска одновременно во всех процессах"""
+    def __init__(self, parser, interval=PARSE_INTERVAL_MINUTES * 60, jitter=PARSE_JITTER_SECONDS):
+        self.parser = parser
+        self.interval = interval
+        self.jitter = jitter
+        self.current = None
+        self.task = None
+        # Фоновые задачи, ждущие результата ручного запуска
+        self.waiters = set()
+        self.next_run_at = time.monotonic()
+        # Владелец аренды парсинга в parse_lease
+        self.owner = f'{os.getpid()}-{random.getrandbits(32):08x}'
+
+    @property
+    def running(self):
+        return self.current is not None and not self.current.done()
+
+    async def busy(self):
+        """Идет ли парсинг в этом или в другом процессе"""
+        return self.running or await self.lease_owner() is not None
+
+    def start(self):
+        """Фоновый цикл: первый парсинг сразу при старте, дальше по расписанию"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run_forever())
+
+    def spawn(self, coroutine):
+        """Фоновое ожидание запуска; ссылка хранится, пока задача не завершится"""
+        task = asyncio.create_task(coroutine)
+        self.waiters.add(task)
+        task.add_done_callback(self.waiters.discard)
+        return task
+
+    async def run(self, trigger='schedule'):
+        """Запуск парсинга; если он уже идет, дожидаемся того же результата"""
+        if not self.running:
+            self.current = asyncio.create_task(self.run_once(trigger))
+        # shield: отмена одного ожидающего не прерывает общий запуск
+        return await asyncio.shield(self.current)
+
+    async def run_once(self, trigger):
+        """Запуск под арендой; если парсинг уже идет в другом процессе, ждем его итогов"""
+        if not await self.acquire_lease():
+            return await self.wait_other_run(trigger)
+
+        heartbeat = asyncio.create_task(self.keep_lease())
+        try:
+            return await self.parse(trigger)
+        finally:
+            heartbeat.cancel()
+            await self.release_lease()
 
-# === АВТОПАРСИНГ ПРИ СТАРТЕ ===
-async def auto_parse_events():
-    """Автоматический парсинг при запуске бота"""
-    try:
-        logger.info("🔄 Автопарсинг мероприятий из VK...")
+    async def parse(self, trigger):
+        logger.info(f"🔄 Парсинг мероприятий из VK ({trigger})...")
         logger.info(f"📋 Группы: {VK_GROUP_IDS}")
         logger.info(f"🔍 Ключевые слова: {VK_EVENT_KEYWORDS}")
+        started_at = time.time()
+        try:
+            # Один проход по VK и AI, затем переводы для всех языков
+            saved = await self.parser.parse_and_save(VK_GROUP_IDS, VK_EVENT_KEYWORDS)
+        except Exception as e:
+            await self.record_run(trigger, started_at, 'error', error=str(e))
+            raise
+        finally:
+            self.next_run_at = time.monotonic() + self.interval + random.uniform(-self.jitter, self.jitter)
+
+        await self.record_run(trigger, started_at, 'ok', result=saved)
+        if any(inserted or updated for inserted, updated in saved.values()):
+            logger.info(f"✅ Парсинг: сохранено по языкам {saved}")
+        else:
+            logger.info("✅ Парсинг: новых мероприятий не найдено")
+        return saved
+
+    async def wait_other_run(self, trigger):
+        """Итоги запуска, который идет в другом процессе; плановый запуск просто пропускается"""
+        if trigger == 'schedule':
+            logger.info("ℹ️ Парсинг уже идет в другом процессе, плановый запуск пропущен")
+            self.next_run_at = time.monotonic() + self.interval + random.uniform(-self.jitter, self.jitter)
+            return {}
+
+        logger.info("⏳ Парсинг уже идет в другом процессе, ждем его итогов")
+        last_id = await self.load_last_run_id()
+        while await self.lease_owner() is not None:
+            await asyncio.sleep(PARSE_LEASE_POLL_SECONDS)
+
+        async with database.read() as db:
+            cursor = await db.execute(
+                'SELECT id, status, result FROM parse_runs ORDER BY id DESC LIMIT 1'
+            )
+            row = await cursor.fetchone()
+        # Нет новой записи - процесс с арендой упал, не дописав итоги
+        if row is None or row[0] == last_id or row[1] != 'ok':
+            raise RuntimeError("парсинг в другом процессе завершился с ошибкой")
+        return {language: tuple(counts) for language, counts in json.loads(row[2]).items()}
+
+    async def acquire_lease(self):
+        now = time.time()
+        async with database.transaction() as db:
+            await db.execute(SQL_ACQUIRE_PARSE_LEASE, (self.owner, now + PARSE_LEASE_SECONDS, now))
+            cursor = await db.execute(SQL_GET_PARSE_LEASE_OWNER, (now,))
+            row = await cursor.fetchone()
+        return row is not None and row[0] == self.owner
+
+    async def lease_owner(self):
+        async with database.read() as db:
+            cursor = await db.execute(SQL_GET_PARSE_LEASE_OWNER, (time.time(),))
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def keep_lease(self):
+        """Продление аренды, пока идет парсинг"""
+        while True:
+            await asyncio.sleep(PARSE_LEASE_SECONDS / 3)
+            try:
+                async with database.transaction() as db:
+                    await db.execute(SQL_RENEW_PARSE_LEASE, (time.time() + PARSE_LEASE_SECONDS, self.owner))
+            except Exception as e:
+                logger.error(f"❌ Ошибка продления аренды парсинга: {e}")
 
-        parser = VKParser(
-            vk,
-            yandex_api_key=YANDEX_API_KEY,
-            folder_id=YANDEX_FOLDER_ID
-        )
-
-        # Парсим на обоих языках для начального наполнения базы
-        events_ru = await parser.search_events(VK_GROUP_IDS, VK_EVENT_KEYWORDS, 'ru')
-        saved_count_ru = await parser.save_events_to_db(events_ru, 'ru')
+    async def release_lease(self):
+        try:
+            async with database.transaction() as db:
+                await db.execute(SQL_RELEASE_PARSE_LEASE, (self.owner,))
+        except Exception as e:
+            logger.error(f"❌ Ошибка освобождения аренды парсинга: {e}")
+
+    async def run_forever(self):
+        while True:
+            # Ручной /update тоже сдвигает следующий плановый запуск
+            delay = self.next_run_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await self.run('schedule')
+            except Exception as e:
+                logger.error(f"❌ Ошибка планового парсинга: {e}")
 
-        # Также парсим на английском
-        events_en = await parser.search_events(VK_GROUP_IDS, VK_EVENT_KEYWORDS, 'en')
-        saved_count_en = await parser.save_events_to_db(events_en, 'en')
+    async def record_run(self, trigger, started_at, status, result=None, error=None):
+        """Сохранить итоги запуска; хранятся последние PARSE_RUNS_KEEP записей"""
+        try:
+            async with database.transaction() as db:
+                await db.execute(
+                    '''INSERT INTO parse_runs (trigger, started_at, finished_at, status, result, error)
+                       VALUES (?, ?, ?, ?, ?, ?)''',
+                    (trigger, started_at, time.time(), status,
+                     json.dumps(result) if result is not None else None, error)
+                )
+                await db.execute(
+                    'DELETE FROM parse_runs WHERE id <= (SELECT MAX(id) FROM parse_runs) - ?',
+                    (PARSE_RUNS_KEEP,)
+                )
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения статистики парсинга: {e}")
 
-        if saved_count_ru > 0 or saved_count_en > 0:
-            logger.info(f"✅ Автопарсинг: сохранено {saved_count_ru} мероприятий на русском и {saved_count_en} на английском")
-        else:
-            logger.info("✅ Автопарсинг: новых мероприятий не найдено")
+    async def load_last_run_id(self):
+        async with database.read() as db:
+            cursor = await db.execute('SELECT MAX(id) FROM parse_runs')
+            return (await cursor.fetchone())[0]
 
-    except Exception as e:
-        logger.error(f"❌ Ошибка автопарсинга: {e}")
+    async def load_last_run(self):
+        async with database.read() as db:
+            cursor = await db.execute(
+                'SELECT started_at, finished_at, status, result FROM parse_runs ORDER BY id DESC LIMIT 1'
+            )
+            return await cursor.fetchone()
+
+    async def describe_last_run(self, lang):
+        """Строка о последнем парсинге для /status"""
+        if await self.busy():
+            return translator.get_text('last_parse_running', lang)
+        row = await self.load_last_run()
+        if row is None:
+            return translator.get_text('last_parse_never', lang)
+
+        started_at, finished_at, status, result = row
+        time_format = '%m/%d/%Y %H:%M' if lang == 'en' else '%d.%m.%Y %H:%M'
+        finished_text = datetime.fromtimestamp(finished_at).strftime(time_format)
+        if status != 'ok':
+            return translator.get_text('last_parse_failed', lang, finished_at=finished_text)
+
+        inserted, updated = json.loads(result).get(lang, (0, 0))
+        return translator.get_text('last_parse_ok', lang,
+                                   finished_at=finished_text,
+                                   duration=round(finished_at - started_at, 1),
+                                   inserted=inserted,
+                                   updated=updated
+                                   )
+
+    async def close(self):
+        for task in (self.task, self.current, *self.waiters):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+parse_scheduler = ParseScheduler(VKParser(
+    vk,
+    yandex_api_key=YANDEX_API_KEY,
+    folder_id=YANDEX_FOLDER_ID,
+    vk_client=vk_client,
+    ai_analyzer=ai_analyzer,
+    local_extractor=local_extractor,
+    fingerprints=fingerprint_index
+))
+
+# === ЗАПУСК И ЗАВЕРШЕНИЕ РАБОТЫ ===
+@dp.startup()
+async def on_startup():
+    """Запуск фоновых задач вместе с ботом"""
+    text_translator.start()
+    if PARSE_SCHEDULE:
+        parse_scheduler.start()
+    else:
+        logger.info("ℹ️ Плановый парсинг отключен (PARSE_SCHEDULE=false), им занимается другой воркер")
+    await metrics.start_server()
+
+@dp.shutdown()
+async def on_shutdown():
+    """Освобождение общих ресурсов при остановке бота"""
+    await parse_scheduler.close()
+    await message_queue.close()
+    await metrics.close()
+    await text_translator.close()
+    await vk_client.close()
+    if ai_analyzer:
+        await ai_analyzer.close()
+    await ai_cache.flush()
+    if local_extractor:
+        local_extractor.close()
+    await database.close()
+    logger.info("✅ Сетевые клиенты и база данных закрыты")
 
 # === ЗАПУСК С ОБРАБОТКОЙ ОШИБОК ===
 async def safe_start_polling():
@@ -1108,6 +3434,8 @@ async def safe_start_polling():
     for attempt in range(max_retries):
         try:
             logger.info(f"🚀 Попытка запуска бота {attempt + 1}/{max_retries}...")
+            # Если раньше бот работал через вебхук, getUpdates без его удаления не работает
+            await bot.delete_webhook()
             await dp.start_polling(bot)
             break
         except Exception as e:
@@ -1119,17 +3447,116 @@ async def safe_start_polling():
                 logger.error("❌ Все попытки запуска провалились")
                 raise
 
+# === РЕЖИМ ВЕБХУКА ===
+class WebhookServer:
+    """Прием обновлений от Telegram: ответ сразу, обработка в ограниченном пуле воркеров"""
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, dispatcher, bot, secret=WEBHOOK_SECRET, queue_size=WEBHOOK_QUEUE_SIZE, workers=WEBHOOK_WORKERS):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret = secret
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.worker_count = workers
+        self.workers = []
+
+    async def handle(self, request):
+        """POST от Telegram: проверка секрета и постановка обновления в очередь"""
+        if self.secret and not hmac.compare_digest(request.headers.get(self.SECRET_HEADER, ''), self.secret):
+            metrics.inc('bot_webhook_updates_total', result='forbidden')
+            return web.Response(status=403)
+
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except ValueError as e:
+            logger.warning(f"⚠️ Некорректное обновление вебхука: {e}")
+            metrics.inc('bot_webhook_updates_total', result='invalid')
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Не 200: Telegram повторит доставку позже, обновление не потеряется
+            logger.warning(f"⚠️ Очередь вебхука заполнена ({self.queue.maxsize}), обновление {update.update_id} отклонено")
+            metrics.inc('bot_webhook_updates_total', result='rejected')
+            return web.Response(status=503)
+
+        metrics.inc('bot_webhook_updates_total', result='queued')
+        return web.Response()
+
+    async def worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                with metrics.track('update'):
+                    await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, app):
+        """Запуск воркеров и регистрация вебхука в Telegram"""
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.worker_count)]
+        if not WEBHOOK_URL:
+            logger.warning("⚠️ WEBHOOK_URL не задан: вебхук должен быть зарегистрирован заранее")
+            return
+        await self.bot.set_webhook(
+            WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=self.secret or None,
+            allowed_updates=self.dispatcher.resolve_used_update_types()
+        )
+        logger.info(f"✅ Вебхук зарегистрирован: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+    async def close(self, app, timeout=10):
+        """Дообработать принятые обновления и остановить воркеров"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не обработано обновлений при остановке: {self.queue.qsize()}")
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def application(self):
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle)
+        app.on_startup.append(self.start)
+        # Очередь дообрабатывается до on_shutdown диспетчера, который закрывает базу и клиентов
+        app.on_shutdown.append(self.close)
+        setup_application(app, self.dispatcher, bot=self.bot)
+        return app
+
+async def start_webhook():
+    """Запуск aiohttp-сервера вебхука; работает до остановки процесса"""
+    if not WEBHOOK_SECRET:
+        logger.warning("⚠️ WEBHOOK_SECRET не задан: запросы к вебхуку не проверяются")
+    server = WebhookServer(dp, bot)
+    metrics.gauge('bot_webhook_queue_depth', 'Обновления вебхука, ожидающие обработки', server.queue.qsize)
+    runner = web.AppRunner(server.application(), access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"🌐 Вебхук слушает http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} "
+                    f"(воркеров: {server.worker_count}, очередь: {server.queue.maxsize})")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
 async def main():
     try:
+        await database.connect()
         await init_db()
         await migrate_db()  # Добавляем миграцию
         logger.info("✅ База данных инициализирована")
 
-        # Автоматический парсинг при старте (в фоне)
-        asyncio.create_task(auto_parse_events())
-
         logger.info("🚀 Запуск бота с мультиязычной поддержкой...")
-        await safe_start_polling()
+        if BOT_MODE == 'webhook':
+            await start_webhook()
+        else:
+            await safe_start_polling()
 
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")